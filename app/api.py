@@ -0,0 +1,354 @@
+# Read-only JSON API over the same loaders as the dashboard.
+#
+#   GET /api/version                       newest reading / prediction date
+#   GET /api/stations/latest               latest reading per station today
+#   GET /api/stations/<station>/series     ?start=YYYY-MM-DD&end=YYYY-MM-DD
+#   GET /api/stations/<station>/daily      daily means, same parameters
+#   GET /api/export                        CSV of tes, streamed; optional
+#                                          start, end, station, source
+#   GET /api/grid                          ?date=YYYY-MM-DD[&model=pm25_xgb]
+#   GET /api/metrics                       evaluation metrics per model
+#   GET /metrics                           Prometheus metrics of this process
+#
+# Every response carries an ETag and Last-Modified derived from the data
+# version, so nginx and clients can revalidate without re-running the query.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+import cache
+import db
+import metrics
+from evaluation import evaluate_models
+from spatial import MODEL_COLUMNS
+from stream import csv_chunks, daily_means
+
+
+# How long the data version is trusted before asking Postgres again
+VERSION_TTL = int(os.environ.get("API_VERSION_TTL", 60))
+
+# Cache-Control max-age per endpoint, in seconds
+MAX_AGE = {
+	"version": 30,
+	"latest": 60,
+	"series": 300,
+	"daily": 300,
+	"export": 300,
+	"grid": 3600,
+	"metrics": 3600
+}
+
+
+class HTTPError(Exception):
+	def __init__(self, status, message):
+		super().__init__(message)
+		self.status = status
+		self.message = message
+
+
+class Stream:
+	# A response body produced chunk by chunk instead of held in memory
+	def __init__(self, content_type, chunks, filename=None):
+		self.content_type = content_type
+		self.chunks = chunks
+		self.filename = filename
+
+
+class DataVersion:
+	# Caches the data version for VERSION_TTL seconds so revalidation requests
+	# are answered without a database round trip
+
+	def __init__(self, ttl):
+		self.ttl = ttl
+		self._lock = threading.Lock()
+		self._value = None
+		self._expires = 0
+
+	def get(self):
+		with self._lock:
+			if time.monotonic() >= self._expires:
+				self._value = db.load_data_version()
+				self._expires = time.monotonic() + self.ttl
+			return self._value
+
+
+class BodyCache:
+	# Small LRU of serialised response bodies keyed by ETag
+
+	def __init__(self, max_entries=256):
+		self.max_entries = max_entries
+		self._lock = threading.Lock()
+		self._items = OrderedDict()
+
+	def get(self, key):
+		with self._lock:
+			if key in self._items:
+				self._items.move_to_end(key)
+				return self._items[key]
+		return None
+
+	def put(self, key, body):
+		with self._lock:
+			self._items[key] = body
+			self._items.move_to_end(key)
+			while len(self._items) > self.max_entries:
+				self._items.popitem(last=False)
+
+
+data_version = DataVersion(VERSION_TTL)
+body_cache = BodyCache()
+
+
+def frame_to_records(df):
+	# Measures are float32, so trim the float64 noise from the JSON output
+	return json.loads(df.to_json(orient="records", date_format="iso", double_precision=5))
+
+
+def parse_date(value, name):
+	try:
+		return datetime.strptime(value, "%Y-%m-%d").date()
+	except (TypeError, ValueError):
+		raise HTTPError(400, f"'{name}' must be a date in YYYY-MM-DD format")
+
+
+def last_modified(version):
+	# Naive stamps are local wall-clock time; compare everything in UTC
+	stamps = []
+	for value in version.values():
+		if value is None or pd.isna(value):
+			continue
+		stamp = pd.Timestamp(value).to_pydatetime().replace(microsecond=0)
+		stamps.append((stamp if stamp.tzinfo else stamp.astimezone()).astimezone(timezone.utc))
+	return max(stamps) if stamps else None
+
+
+def get_version(_query):
+	version = data_version.get()
+	return {k: (str(v) if v is not None else None) for k, v in version.items()}
+
+
+def get_latest(_query):
+	df_today = db.load_data()
+	df_latest = df_today.sort_values("time").groupby("station", as_index=False, observed=True).last()
+	return frame_to_records(df_latest)
+
+
+def parse_range(query, max_days=366):
+	today = datetime.now().date()
+	start = parse_date(query["start"], "start") if "start" in query else today
+	end = parse_date(query["end"], "end") if "end" in query else start
+	if end < start:
+		raise HTTPError(400, "'end' must not be before 'start'")
+	if max_days is not None and end - start > timedelta(days=max_days):
+		raise HTTPError(400, f"Date ranges are limited to {max_days} days")
+	return f"{start} 00:00:00", f"{end} 23:59:59"
+
+
+def get_series(query, station):
+	start, end = parse_range(query)
+	df = db.load_station_series(station, start, end)
+	return frame_to_records(df)
+
+
+def get_daily(query, station):
+	# Aggregated chunk by chunk from a server-side cursor
+	start, end = parse_range(query, max_days=None)
+	return frame_to_records(daily_means(db.iter_tes(start, end, stations=[station])))
+
+
+def get_export(query):
+	start, end = (parse_range(query, max_days=None) if "start" in query or "end" in query else (None, None))
+	stations = [query["station"]] if "station" in query else None
+	frames = db.iter_tes(start, end, stations=stations, sourceid=query.get("source"))
+	return Stream("text/csv", csv_chunks(frames), filename="air_quality.csv")
+
+
+def get_grid(query):
+	date = parse_date(query.get("date"), "date")
+	columns = list(MODEL_COLUMNS.values())
+	if "model" in query:
+		if query["model"] not in columns:
+			raise HTTPError(400, f"'model' must be one of {', '.join(columns)}")
+		columns = [query["model"]]
+
+	df_grid = db.load_grid(date)
+	return frame_to_records(df_grid[["latitude", "longitude"] + columns])
+
+
+def get_metrics(_query):
+	# Keyed on the data version, so a cache hit skips loading the frames too
+	version = data_version.get()
+	key = cache.make_key("aod_evaluation", (version["tes_time"], version["grid_date"], version["grid_updated"]), {})
+	_, scores = cache.memory.get_or_compute(
+		"aod_evaluation", key,
+		lambda: evaluate_models(db.load_df_10(), db.load_df_pm25(), list(MODEL_COLUMNS.values())), ttl=3600
+	)
+	return {name: scores[column] for name, column in MODEL_COLUMNS.items() if column in scores}
+
+
+def route(path):
+	parts = [unquote(p) for p in path.strip("/").split("/")]
+	if parts[:1] != ["api"]:
+		return None
+	parts = parts[1:]
+
+	if parts == ["version"]:
+		return "version", get_version, ()
+	if parts == ["stations", "latest"]:
+		return "latest", get_latest, ()
+	if len(parts) == 3 and parts[0] == "stations" and parts[2] == "series":
+		return "series", get_series, (parts[1],)
+	if len(parts) == 3 and parts[0] == "stations" and parts[2] == "daily":
+		return "daily", get_daily, (parts[1],)
+	if parts == ["export"]:
+		return "export", get_export, ()
+	if parts == ["grid"]:
+		return "grid", get_grid, ()
+	if parts == ["metrics"]:
+		return "metrics", get_metrics, ()
+	return None
+
+
+class Handler(BaseHTTPRequestHandler):
+	server_version = "AQIDashboardAPI/1.0"
+
+	def do_GET(self):
+		self.handle_request(send_body=True)
+
+	def do_HEAD(self):
+		self.handle_request(send_body=False)
+
+	def handle_request(self, send_body):
+		url = urlparse(self.path)
+		query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+		if url.path == "/metrics":
+			return self.send_metrics(send_body)
+
+		matched = route(url.path)
+		if matched is None:
+			return self.send_json(404, {"error": "Not found"}, send_body=send_body)
+		name, handler, args = matched
+
+		try:
+			version = data_version.get()
+		except Exception:
+			return self.send_json(503, {"error": "Database unavailable"}, send_body=send_body)
+
+		key = json.dumps([url.path, sorted(query.items()), get_version(None)], default=str)
+		etag = '"' + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + '"'
+		modified = last_modified(version)
+
+		headers = {
+			"ETag": etag,
+			"Cache-Control": f"public, max-age={MAX_AGE[name]}"
+		}
+		if modified is not None:
+			headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+
+		if self.not_modified(etag, modified):
+			return self.send_json(304, None, headers, send_body=False)
+
+		body = body_cache.get(etag)
+		if body is None:
+			try:
+				result = handler(query, *args)
+				if isinstance(result, Stream):
+					return self.send_stream(result, headers, send_body)
+				body = json.dumps(result, default=str).encode("utf-8")
+			except HTTPError as e:
+				return self.send_json(e.status, {"error": e.message}, send_body=send_body)
+			except Exception as e:
+				self.log_error("%s failed: %r", url.path, e)
+				return self.send_json(500, {"error": "Internal error"}, send_body=send_body)
+			body_cache.put(etag, body)
+
+		self.send_body(200, body, headers, send_body)
+
+	def not_modified(self, etag, modified):
+		if_none_match = self.headers.get("If-None-Match")
+		if if_none_match is not None:
+			# Weak comparison (RFC 9110 13.1.2): nginx's gzip turns the ETag
+			# into W/"...", and clients send that form back
+			tags = [t.strip() for t in if_none_match.split(",")]
+			return if_none_match.strip() == "*" or etag in [t[2:] if t.startswith("W/") else t for t in tags]
+
+		if_modified_since = self.headers.get("If-Modified-Since")
+		if if_modified_since and modified is not None:
+			try:
+				return modified <= parsedate_to_datetime(if_modified_since)
+			except (TypeError, ValueError):
+				return False
+		return False
+
+	def send_json(self, status, payload, headers=None, send_body=True):
+		body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+		if status >= 400:
+			headers = {"Cache-Control": "no-store"}
+		self.send_body(status, body, headers or {}, send_body)
+
+	def send_metrics(self, send_body):
+		# Prometheus scrape of this process; never cached
+		body = metrics.render().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4")
+		self.send_header("Content-Length", str(len(body)))
+		self.send_header("Cache-Control", "no-store")
+		self.end_headers()
+		if send_body:
+			self.wfile.write(body)
+
+	def send_stream(self, stream, headers, send_body):
+		# No Content-Length: the body ends when the connection closes (HTTP/1.0)
+		self.send_response(200)
+		self.send_header("Content-Type", stream.content_type)
+		if stream.filename:
+			self.send_header("Content-Disposition", f'attachment; filename="{stream.filename}"')
+		self.send_header("Access-Control-Allow-Origin", "*")
+		for k, v in headers.items():
+			self.send_header(k, v)
+		self.send_header("Connection", "close")
+		self.end_headers()
+		try:
+			if send_body:
+				for chunk in stream.chunks:
+					self.wfile.write(chunk)
+		finally:
+			# Also on a client disconnect, so the export's cursor and pooled
+			# connection are released now rather than at garbage collection
+			if hasattr(stream.chunks, "close"):
+				stream.chunks.close()
+
+	def send_body(self, status, body, headers, send_body):
+		self.send_response(status)
+		if status != 304:
+			self.send_header("Content-Type", "application/json")
+			self.send_header("Content-Length", str(len(body)))
+		self.send_header("Access-Control-Allow-Origin", "*")
+		for k, v in headers.items():
+			self.send_header(k, v)
+		self.end_headers()
+		if send_body and status != 304:
+			self.wfile.write(body)
+
+
+def main():
+	host = os.environ.get("API_HOST", "0.0.0.0")
+	port = int(os.environ.get("API_PORT", 8000))
+	server = ThreadingHTTPServer((host, port), Handler)
+	print(f"Serving API on http://{host}:{port}/api/")
+	server.serve_forever()
+
+
+if __name__ == "__main__":
+	main()
@@ -1,18 +1,25 @@
 
 import streamlit as st
 import pandas as pd
-import os
-import psycopg2
 import folium
 from streamlit_folium import st_folium
 import numpy as np
 from scipy.spatial import cKDTree
 from folium import CircleMarker
-import geopandas as gpd
 from shapely.geometry import Point
-from sklearn.metrics import mean_squared_error,r2_score
 from streamlit_option_menu import option_menu
 from datetime import datetime
+import cache
+import db
+from downsample import MAX_POINTS, downsample, pick_bucket
+import metrics
+import perf
+import profiling
+import schema
+from evaluation import error_breakdown, evaluate_models
+from station_index import index_for
+from spatial import GridIndex, MODEL_COLUMNS, NeighbourIndex, latest_station_readings, parse_coordinates, read_sites, score_sites, sites_to_csv
+from transform import heatmap_points, latest_per_station, station_leaderboard, weekly_daily_means
 
 st.markdown(
 	"""
@@ -100,6 +107,14 @@ with st.sidebar:
 
 
 
+# ⏱ Time this rerun's loaders and sections (see perf.py); METRICS_PORT serves
+# them with cache and pool statistics from a background thread
+metrics.start_server()
+perf.start(page)
+
+# 🔬 ?profile=<PROFILE_TOKEN> runs this rerun under cProfile and tracemalloc
+profiler = profiling.start_if_requested(st.query_params.get("profile"))
+
 st.markdown("""
 <style>
 /* Main page background */
@@ -111,42 +126,51 @@ body, .stApp {
 """, unsafe_allow_html=True)
 
 
-def get_connection():
-	return psycopg2.connect(
-		host=os.environ.get("DB_HOST"),
-		port=os.environ.get("DB_PORT"),
-		dbname=os.environ.get("DB_NAME"),
-		user=os.environ.get("DB_USER"),
-		password=os.environ.get("DB_PASS")
-	)
-
-# Connect and read data
-@st.cache_data(ttl=3600) 
+# Connect and read data (queries live in db.py, shared with the JSON API).
+# cache.cached keeps results under a memory budget and shares them between
+# replicas when CACHE_BACKEND is set. Returned frames are shared, don't modify them.
+@perf.timed()
+@cache.cached(ttl=3600)
 def load_data(today=None):
-	# Use today's date if not provided
-	if today is None:
-		today = datetime.now().strftime('%Y-%m-%d')
-
-	conn = get_connection()
-
-	# Only select needed columns and filter to today
-	query = f"""
-		SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
-		FROM tes
-		WHERE time >= '{today} 00:00:00'
-		  AND aqi IS NOT NULL
-		  AND aqi != 0
-	"""
-
-	df_today = pd.read_sql(query, conn)
-	conn.close()
-	return df_today
-df_today = load_data()
+	return db.load_data(today)
+
+@perf.timed()
+@cache.cached(ttl=3600)
+def load_weekly_data(start_of_week, end_of_week):
+	return db.load_weekly_data(start_of_week, end_of_week)
+
+# Time of the last prediction upload, checked at most once a minute. The grid
+# loaders take it as an argument, so an upload moves them to new cache keys
+# instead of serving the old grid until their TTL runs out.
+def grid_version():
+	return cache.memory.get_or_compute(
+		"grid_version", "grid_version", lambda: str(db.load_data_version()["grid_updated"]), ttl=60
+	)
 
 with open("static/style.css") as f:
 	st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
 if page == "Air Quality Monitor":
+	from datetime import timedelta
+
+	today = datetime.now()
+
+	# Start of week as datetime
+	start_of_week = today - timedelta(days=today.weekday())  
+	end_of_week   = start_of_week + timedelta(days=6)        
+
+	# Format as strings for SQL
+	start_of_week_str = start_of_week.strftime('%Y-%m-%d 00:00:00')
+	end_of_week_str   = end_of_week.strftime('%Y-%m-%d 23:59:59')
+
+	# Today's readings and this week's readings are independent, so fetch them side by side
+	with perf.span("monitor.load"):
+		loaded = db.fetch_concurrently(
+			today=load_data,
+			week=lambda: load_weekly_data(start_of_week_str, end_of_week_str)
+		)
+	df_today, df_week = loaded["today"], loaded["week"]
+
 	st.markdown(f"""
 							<div style="font-size: 24px; font-weight: 600; margin-bottom: 10px;">
 								Real-Time Air Quality Dashboard
@@ -230,8 +254,10 @@ if page == "Air Quality Monitor":
 
 	# Filter to only today's data
 
+	perf.section("monitor.selectors")
+
 	# ✅ Get latest data per station *from today's data only*
-	df_latest = df_today.sort_values("time").groupby("station", as_index=False).last()
+	df_latest = latest_per_station(df_today)
 
 	# ✅ Add color
 	def get_rgba_color(aqi, alpha=0.7):
@@ -255,7 +281,9 @@ if page == "Air Quality Monitor":
 	"""
 	st.html(f"<style>{css}</style>")
 
-	# 🔘 Selectors with custom container
+	# 🔘 Selectors with custom container. The source filters every panel below,
+	# so changing it reruns the page; the map, station detail and leaderboards
+	# are fragments that rerun on their own.
 	with st.container(key="selector_box"):
 		sourceid_list = df_latest["sourceid"].unique()
 
@@ -265,76 +293,34 @@ if page == "Air Quality Monitor":
 
 		stations_in_source = df_latest[df_latest["sourceid"] == selected_source]["station"].unique()
 
-		# Set default for station (e.g., first one or a specific station)
-		default_station = stations_in_source[0]
-		selected_station = st.selectbox("Select Station", stations_in_source, index=list(stations_in_source).index(default_station))
-
-		selected_row = df_latest[df_latest["station"] == selected_station].iloc[0]
-		center = [selected_row["latitude"], selected_row["longitude"]]
-
+	# The station shared by the map and the detail panel, kept valid for the source
+	if st.session_state.get("monitor_station") not in stations_in_source:
+		st.session_state.monitor_station = stations_in_source[0]
 
 	st.markdown("<br>", unsafe_allow_html=True)
 
-	# 🗺️ Build folium map
-	m = folium.Map(
-		location=center,
-		zoom_start=13,
-		control_scale=True,
-		scrollWheelZoom=True,
-		tiles="CartoDB positron",
-	)
-
-	from folium.features import DivIcon
-
 	# Filter hanya data dari selected_source
 	filtered_df = df_latest[df_latest["sourceid"] == selected_source]
 
-	# Loop untuk semua station dalam source itu
-	for _, row in filtered_df.iterrows():
-		aqi = row["aqi"]
-		color = row["color"]
-		label = f"{int(aqi)}" if pd.notna(aqi) else "?"
-
-		is_selected = row["station"] == selected_station
-		size = 28 if is_selected else 24
-		font_size = "11px" if is_selected else "10px"
-		border = "2px solid white" if is_selected else "none"
-
-		folium.Marker(
-			location=[row["latitude"], row["longitude"]],
-			icon=DivIcon(
-				icon_size=(size, size),
-				icon_anchor=(size // 2, size // 2),
-				html=f"""
-				<div style='
-					background-color:{color};
-					color:white;
-					font-size:{font_size};
-					font-weight:bold;
-					border-radius:50%;
-					width:{size}px;
-					height:{size}px;
-					text-align:center;
-					line-height:{size}px;
-					box-shadow: 0 0 2px #333;
-					border:{border};'>
-					{label}
-				</div>
-				""",
-			),
-			tooltip=f"{row['station']}",
-			popup=folium.Popup(
-				f"""
-				<div style='font-size: 13px; line-height: 1.5'>
-					<b>Station:</b> {row['station']}<br/>
-					<b>Latest Time:</b> {row['time'].strftime('%Y-%m-%d %H:%M')}<br/>
-					<b>AQI:</b> {row['aqi']:.0f}<br/>
-					<b>PM2.5:</b> {row['PM2.5']:.1f} µg/m³
-				</div>
-				""",
-				max_width=500,
-			),
-		).add_to(m)
+	# 🌫️ Interpolated surface from the latest station readings
+	@perf.timed()
+	@cache.cached(ttl=86400)
+	def load_grid_cells(grid_version):
+		return db.load_grid_cells()
+
+	@st.cache_resource(max_entries=4)
+	def get_neighbour_index(grid_version, station_coords):
+		df_grid = load_grid_cells(grid_version)
+		lat, lon = zip(*station_coords)
+		return NeighbourIndex(df_grid["latitude"].values, df_grid["longitude"].values, lat, lon)
+
+	# Keyed on the newest reading, so the surface is only recomputed when new hourly data arrives
+	@st.cache_data(max_entries=8)
+	def interpolate_surface(latest_time, grid_version, station_coords, values, method):
+		index = get_neighbour_index(grid_version, station_coords)
+		surface = index.kriging(values) if method == "Kriging" else index.idw(values)
+		df_grid = load_grid_cells(grid_version)
+		return pd.DataFrame({"latitude": df_grid["latitude"], "longitude": df_grid["longitude"], "PM2.5": surface})
 
 	# 🌍 Show map full-width
 	css2 = """
@@ -347,55 +333,146 @@ if page == "Air Quality Monitor":
 	"""
 	st.html(f"<style>{css2}</style>")
 
-	with st.container(key="map"):
-		
-		map_output = st_folium(m, height=500,use_container_width=True, returned_objects=["last_object_clicked"])
-
-		# 📘 Legend
-		legend_html = """
-		<div style="display: flex; flex-wrap: wrap; gap: 10px; font-size: 12px;">
-			<div style="display: flex; align-items: center; gap: 4px;">
-				<div style="background-color: rgba(0, 228, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Good (0–50)
-			</div>
-			<div style="display: flex; align-items: center; gap: 4px;">
-				<div style="background-color: rgba(255, 255, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Moderate (51–100)
-			</div>
-			<div style="display: flex; align-items: center; gap: 4px;">
-				<div style="background-color: rgba(255, 126, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Unhealthy for SG (101–150)
-			</div>
-			<div style="display: flex; align-items: center; gap: 4px;">
-				<div style="background-color: rgba(255, 0, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Unhealthy (151–200)
-			</div>
-			<div style="display: flex; align-items: center; gap: 4px;">
-				<div style="background-color: rgba(143, 63, 151, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Very Unhealthy (201–300)
-			</div>
-			<div style="display: flex; align-items: center; gap: 4px;">
-				<div style="background-color: rgba(126, 0, 35, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Hazardous (301+)
-			</div>
-		</div>
-		"""
-		st.markdown(legend_html, unsafe_allow_html=True)
-		st.markdown("<br>", unsafe_allow_html=True)
-
-	if map_output and map_output["last_object_clicked"]:
-		lat_click = map_output["last_object_clicked"]["lat"]
-		lon_click = map_output["last_object_clicked"]["lng"]
-		df_latest["distance"] = ((df_latest["latitude"] - lat_click)**2 + (df_latest["longitude"] - lon_click)**2)
-		nearest_station = df_latest.sort_values("distance").iloc[0]["station"]
-		selected_station = nearest_station
-		st.success(f"📌 Selected from map: {selected_station}")
+	# 🗺️ Map and station detail share the selected station through
+	# st.session_state.monitor_station. Toggling the surface reruns only the
+	# map; picking a station on either side reruns the map (highlight and
+	# centre) and the detail panel together, never the whole page.
+	def select_station(station, from_map=False):
+		if station == st.session_state.monitor_station:
+			return
+		st.session_state.monitor_station = station
+		if from_map:
+			st.session_state.monitor_map_pick = station
+		st.rerun(scope=["monitor_map", "monitor_detail"])
+
+	def on_map_click():
+		# st_folium keeps returning the last click; this only runs on a new one
+		click = (st.session_state.get("monitor_map_widget") or {}).get("last_object_clicked")
+		if click:
+			distance = (filtered_df["latitude"] - click["lat"])**2 + (filtered_df["longitude"] - click["lng"])**2
+			select_station(filtered_df.loc[distance.idxmin(), "station"], from_map=True)
+
+	@st.fragment(key="monitor_map")
+	def map_panel():
+		with perf.fragment("monitor.map"):
+			selected_station = st.session_state.monitor_station
+			selected_row = df_latest[df_latest["station"] == selected_station].iloc[0]
+			center = [selected_row["latitude"], selected_row["longitude"]]
+
+			with st.container(key="map"):
+				show_surface = st.checkbox("Show interpolated PM2.5 surface")
+				surface_method = st.radio("Interpolation", ["IDW", "Kriging"], horizontal=True) if show_surface else None
+
+				# Build folium map
+				m = folium.Map(
+					location=center,
+					zoom_start=13,
+					control_scale=True,
+					scrollWheelZoom=True,
+					tiles="CartoDB positron",
+				)
 
-	# 7. Now compute station data (based on final selected_station)
-	station_df = df_today[df_today["station"] == selected_station].sort_values("time")
+				from folium.features import DivIcon
+
+				# Loop untuk semua station dalam source itu
+				for _, row in filtered_df.iterrows():
+					aqi = row["aqi"]
+					color = row["color"]
+					label = f"{int(aqi)}" if pd.notna(aqi) else "?"
+
+					is_selected = row["station"] == selected_station
+					size = 28 if is_selected else 24
+					font_size = "11px" if is_selected else "10px"
+					border = "2px solid white" if is_selected else "none"
+
+					folium.Marker(
+						location=[row["latitude"], row["longitude"]],
+						icon=DivIcon(
+							icon_size=(size, size),
+							icon_anchor=(size // 2, size // 2),
+							html=f"""
+							<div style='
+								background-color:{color};
+								color:white;
+								font-size:{font_size};
+								font-weight:bold;
+								border-radius:50%;
+								width:{size}px;
+								height:{size}px;
+								text-align:center;
+								line-height:{size}px;
+								box-shadow: 0 0 2px #333;
+								border:{border};'>
+								{label}
+							</div>
+							""",
+						),
+						tooltip=f"{row['station']}",
+						popup=folium.Popup(
+							f"""
+							<div style='font-size: 13px; line-height: 1.5'>
+								<b>Station:</b> {row['station']}<br/>
+								<b>Latest Time:</b> {row['time'].strftime('%Y-%m-%d %H:%M')}<br/>
+								<b>AQI:</b> {row['aqi']:.0f}<br/>
+								<b>PM2.5:</b> {row['PM2.5']:.1f} µg/m³
+							</div>
+							""",
+							max_width=500,
+						),
+					).add_to(m)
+
+				if show_surface:
+					readings = latest_station_readings(df_today)
+					if len(readings) >= 3:
+						from folium.plugins import HeatMap
+
+						station_coords = tuple(zip(readings["latitude"], readings["longitude"]))
+						df_surface = interpolate_surface(df_today["time"].max().floor("h"), grid_version(), station_coords, tuple(readings["PM2.5"]), surface_method)
+						HeatMap(df_surface[["latitude", "longitude", "PM2.5"]].values.tolist(), radius=15, blur=20, max_zoom=15).add_to(m)
+					else:
+						st.info("Not enough recent station readings to interpolate a surface.")
+
+				with perf.span("monitor.map.st_folium"):
+					st_folium(
+						m, key="monitor_map_widget", height=500, use_container_width=True,
+						returned_objects=["last_object_clicked"], on_change=on_map_click
+					)
+
+				# 📘 Legend
+				legend_html = """
+				<div style="display: flex; flex-wrap: wrap; gap: 10px; font-size: 12px;">
+					<div style="display: flex; align-items: center; gap: 4px;">
+						<div style="background-color: rgba(0, 228, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Good (0–50)
+					</div>
+					<div style="display: flex; align-items: center; gap: 4px;">
+						<div style="background-color: rgba(255, 255, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Moderate (51–100)
+					</div>
+					<div style="display: flex; align-items: center; gap: 4px;">
+						<div style="background-color: rgba(255, 126, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Unhealthy for SG (101–150)
+					</div>
+					<div style="display: flex; align-items: center; gap: 4px;">
+						<div style="background-color: rgba(255, 0, 0, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Unhealthy (151–200)
+					</div>
+					<div style="display: flex; align-items: center; gap: 4px;">
+						<div style="background-color: rgba(143, 63, 151, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Very Unhealthy (201–300)
+					</div>
+					<div style="display: flex; align-items: center; gap: 4px;">
+						<div style="background-color: rgba(126, 0, 35, 0.7); width: 12px; height: 12px; border: 1px solid #000;"></div> Hazardous (301+)
+					</div>
+				</div>
+				"""
+				st.markdown(legend_html, unsafe_allow_html=True)
+				st.markdown("<br>", unsafe_allow_html=True)
 
-	latest_row = station_df.iloc[-1]
+	perf.section(None)
+	map_panel()
 
 	# 8. Split into 3 columns: left = metrics + chart, middle = space, right = top 5 AQI
 	left_col, middle_col, right_col = st.columns([2.5, 0.01, 1.8])
 
 	st.html("""
 	<style>
-	.st-key-left_box, .st-key-right_box,.st-key-right_box_low, .st-key-time_series, .st-key-bar_chart {
+	.st-key-left_box, .st-key-right_box,.st-key-right_box_low, .st-key-time_series, .st-key-bar_chart, .st-key-history {
 		background-color: white;
 		padding: 16px 16px;
 		border-radius: 8px;
@@ -404,101 +481,10 @@ if page == "Air Quality Monitor":
 	</style>
 	""")
 
-	with st.container():
-		with left_col:
-			
-			with st.container(key="left_box"):
-					st.markdown(f"""
-						<div style="font-size: 16px; font-weight: 600; margin-bottom: 10px;">
-							Latest from {latest_row["station"]}
-						</div>
-			
-						<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
-							Here are the metrics of the station's most recent available data.
-						</div>
-						
-					""", unsafe_allow_html=True)
-					# 📊 Scorecards
-					st.markdown("<br>", unsafe_allow_html=True)
-					col1, col2, col3 = st.columns(3)
-
-					# Styling values
-					time_value = latest_row["time"].strftime('%H:%M')
-					aqi_value = latest_row["aqi"]
-					pm_value = latest_row["PM2.5"]
-					color = get_rgba_color(aqi_value)
-
-					def card_style(label, value, color="#ffffff"):
-						return f"""
-							<div style="
-								background-color:{color};
-								padding:14px;
-								border-radius:10px;
-								margin-bottom: 5px;
-								text-align:center;
-							">
-								<p style='font-size:14px;margin:0;'>{label}</p>
-								<p style='font-size:14px;margin:0;'>{value}</p>
-							</div>
-						"""
-
-					# Column 1: Time
-					col1.markdown(card_style(label="Time", value=time_value), unsafe_allow_html=True)
-
-					# Column 2: AQI with color
-					col2.markdown(card_style(label="AQI", value=f"{aqi_value:.0f}", color=color), unsafe_allow_html=True)
-
-					# Column 3: PM2.5
-					col3.markdown(card_style(label="PM2.5", value=f"{pm_value:.1f} µg/m³"), unsafe_allow_html=True)
-					st.markdown("<br>", unsafe_allow_html=True)
-
-			
-			with st.container(key="time_series"):
-					# 📈 Time series
-					st.markdown("""
-					<div style="font-size: 18px; font-weight: 600; margin-bottom: 10px;">
-						Time Series
-					</div>
-
-					<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
-							Hourly PM2.5 and AQI time series for today
-					</div>
-					""", unsafe_allow_html=True)
-					st.markdown("<br>", unsafe_allow_html=True)
-
-					st.line_chart(station_df.set_index("time")[["aqi", "PM2.5"]],width=700,height=250,use_container_width=True)
-						
-			from datetime import datetime, timedelta
-
-			today = datetime.now()
-			
-			def load_weekly_data(start_of_week, end_of_week):
-				conn = get_connection()
-
-				query = f"""
-					SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
-					FROM tes
-					WHERE time BETWEEN '{start_of_week}' AND '{end_of_week}'
-					AND aqi IS NOT NULL
-					AND aqi != 0
-				"""
-
-				df_week = pd.read_sql(query, conn)
-				conn.close()
-				return df_week
-
-			# Start of week as datetime
-			start_of_week = today - timedelta(days=today.weekday())  
-			end_of_week   = start_of_week + timedelta(days=6)        
-
-			# Format as strings for SQL
-			start_of_week_str = start_of_week.strftime('%Y-%m-%d 00:00:00')
-			end_of_week_str   = end_of_week.strftime('%Y-%m-%d 23:59:59')
-
-			# Now pass start_of_week_str and end_of_week_str to your SQL query
-			df_week = load_weekly_data(start_of_week_str, end_of_week_str)
-
-			# 📈 Display as bar chart
+	# 📈 Weekly chart of the station shown in the detail panel
+	@st.fragment
+	def weekly_chart(selected_station):
+		with perf.fragment("monitor.weekly_chart"):
 			with st.container(key="bar_chart"):
 				st.markdown("""
 					<div style="font-size: 18px; font-weight: 600; margin-bottom: 10px;">
@@ -509,33 +495,11 @@ if page == "Air Quality Monitor":
 						Daily average of PM2.5 and AQI bar chart for this week
 					</div>
 				""", unsafe_allow_html=True)
-				
-				import altair as alt
-				
-				weekly_df = df_week[df_week["station"] == selected_station].sort_values("time")
-
-				# 1️⃣ Extract date (no hour)
-				weekly_df["date"] = weekly_df["time"].dt.date  # strips hour
-
-				# 2️⃣ Group by that date
-				daily_avg = weekly_df.groupby("date")[["aqi", "PM2.5"]].mean().reset_index()
 
-				# 3️⃣ Optional: Rename column for PM2.5
-				daily_avg.rename(columns={"PM2.5": "PM2_5"}, inplace=True)
-
-				# Ensure 'date' is a datetime, then normalize to remove the time
-				daily_avg["date"] = pd.to_datetime(daily_avg["date"]).dt.normalize()
-
-				# 🧼 Clean and prepare the data
-				daily_avg["date"] = pd.to_datetime(daily_avg["date"]).dt.normalize()
-				daily_avg = daily_avg[
-					daily_avg["aqi"].notna() & (daily_avg["aqi"] != 0) &
-					daily_avg["PM2_5"].notna() & (daily_avg["PM2_5"] != 0)
-				]
-				daily_avg["weekday"] = daily_avg["date"].dt.strftime("%a")  # e.g., Mon, Tue
+				import altair as alt
 
-				# 📊 Melt to long format for dual bar chart
-				chart_df = daily_avg[["weekday", "PM2_5", "aqi"]].melt(id_vars="weekday", var_name="Metric", value_name="Value")
+				# 📊 Daily means in long format for dual bar chart
+				chart_df = weekly_daily_means(index_for(df_week).station(df_week, selected_station))
 
 				# Define custom colors
 				custom_color = alt.Scale(
@@ -556,92 +520,196 @@ if page == "Air Quality Monitor":
 
 				st.altair_chart(bar_chart,use_container_width=True)
 
-		# Compute daily averages per station
-		df_today_avg = df_today.groupby("station")[["aqi", "PM2.5"]].mean().reset_index()
-		df_today_avg.rename(columns={"PM2.5": "pm25"}, inplace=True)
-
-		
-		# RIGHT COLUMN: Top 5 stations
-		with right_col:
-
-			with st.container(key="right_box"):
+	# 🕰️ History over any date range: aggregated in SQL to the finest bucket
+	# that fits the chart, raw readings thinned with LTTB (see downsample.py)
+	@perf.timed()
+	@cache.cached(ttl=3600)
+	def load_station_history(station, start, end, bucket):
+		return db.load_station_history(station, start, end, bucket)
+
+	@perf.timed()
+	@cache.cached(ttl=3600)
+	def load_station_series(station, start, end):
+		return db.load_station_series(station, start, end)
+
+	@st.fragment
+	def station_history(selected_station):
+		with perf.fragment("monitor.history"):
+			with st.container(key="history"):
 				st.markdown("""
-				<div style="font-size: 18px; font-weight: 600; margin-bottom: 10px;">
-					Highest AQI Today
-				</div>
-				<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
-					Top 5 region with the highest PM2.5 and AQI for today
-				</div>
+					<div style="font-size: 18px; font-weight: 600; margin-bottom: 10px;">
+						History
+					</div>
+
+					<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
+						PM2.5 and AQI over any date range
+					</div>
 				""", unsafe_allow_html=True)
-				df_today_avg["color"] = df_today_avg["aqi"].apply(get_rgba_color)
 
-				# Top 5
-				top5_today = df_today_avg.sort_values("aqi", ascending=False).head(5)
-				top5_today = top5_today.rename(columns={"PM2.5": "pm25"})
+				range_col, resolution_col = st.columns([2, 1])
+				history_range = range_col.date_input(
+					"Date range",
+					value=(today.date() - timedelta(days=30), today.date()),
+					max_value=today.date(),
+					key="monitor_history_range"
+				)
+				resolution = resolution_col.selectbox(
+					"Resolution", ["Auto", "Raw", "Hourly", "Daily", "Weekly"], key="monitor_history_resolution"
+				)
 
-				for i, row in enumerate(top5_today.itertuples(index=False), start=1):
-					station = row.station
-					aqi = row.aqi
-					pm25 = row.pm25
-					color = row.color
+				# Wait for the second date while a range is being picked
+				if len(history_range) != 2:
+					st.info("Pick an end date.")
+					return
+				start = f"{history_range[0]} 00:00:00"
+				end = f"{history_range[1]} 23:59:59"
+
+				buckets = {"Hourly": "hour", "Daily": "day", "Weekly": "week"}
+				if resolution == "Raw":
+					history_df = load_station_series(selected_station, start, end)
+					label = "Readings"
+				else:
+					bucket = buckets.get(resolution) or pick_bucket(start, end)
+					history_df = load_station_history(selected_station, start, end, bucket)
+					label = {v: k for k, v in buckets.items()}[bucket] + " means"
+
+				if history_df.empty:
+					st.info("No readings in this range.")
+					return
+
+				chart_df = downsample(history_df, "time", ["aqi", "PM2.5"])
+				st.caption(f"{label}: {len(chart_df):,} of {len(history_df):,} points shown (at most {MAX_POINTS}).")
+				st.line_chart(chart_df.set_index("time")[["aqi", "PM2.5"]], height=250, use_container_width=True)
+
+	# 7. Station detail: follows the shared selection, see select_station()
+	@st.fragment(key="monitor_detail")
+	def station_detail():
+		with perf.fragment("monitor.station_detail"):
+			# Follow a station picked on the map or a source change
+			picked = st.session_state.pop("monitor_map_pick", None)
+			if picked is not None or st.session_state.get("monitor_station_select") not in stations_in_source:
+				st.session_state.monitor_station_select = st.session_state.monitor_station
 
-					st.markdown(f"""
-					<div style="
-						background-color: #fdfdfd;
-						border-left: 5px solid {color};
-						padding: 14px 14px;
-						border-radius: 8px;
-						margin-bottom: 10px;
-						box-shadow: 0 1px 2px rgba(0,0,0,0.08);
-					">
-						<div style="font-size: 14px; font-weight: bold;">
-							#{i} {station}
-						</div>
-						<div style="font-size: 12px;">
-							AQI: <b>{int(aqi)}</b> | PM2.5: <b>{pm25:.1f} µg/m³</b>
-						</div>
+			with st.container(key="left_box"):
+				selected_station = st.selectbox(
+					"Select Station", stations_in_source, key="monitor_station_select",
+					on_change=lambda: select_station(st.session_state.monitor_station_select)
+				)
+				st.session_state.monitor_station = selected_station
+				if picked == selected_station:
+					st.success(f"📌 Selected from map: {selected_station}")
+
+				station_df = index_for(df_today).station(df_today, selected_station)
+				latest_row = station_df.iloc[-1]
+
+				st.markdown(f"""
+					<div style="font-size: 16px; font-weight: 600; margin-bottom: 10px;">
+						Latest from {latest_row["station"]}
 					</div>
-					""", unsafe_allow_html=True)
+		
+					<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
+						Here are the metrics of the station's most recent available data.
+					</div>
+					
+				""", unsafe_allow_html=True)
+				# 📊 Scorecards
+				st.markdown("<br>", unsafe_allow_html=True)
+				col1, col2, col3 = st.columns(3)
+
+				# Styling values
+				time_value = latest_row["time"].strftime('%H:%M')
+				aqi_value = latest_row["aqi"]
+				pm_value = latest_row["PM2.5"]
+				color = get_rgba_color(aqi_value)
+
+				def card_style(label, value, color="#ffffff"):
+					return f"""
+						<div style="
+							background-color:{color};
+							padding:14px;
+							border-radius:10px;
+							margin-bottom: 5px;
+							text-align:center;
+						">
+							<p style='font-size:14px;margin:0;'>{label}</p>
+							<p style='font-size:14px;margin:0;'>{value}</p>
+						</div>
+					"""
 
-			
+				# Column 1: Time
+				col1.markdown(card_style(label="Time", value=time_value), unsafe_allow_html=True)
+
+				# Column 2: AQI with color
+				col2.markdown(card_style(label="AQI", value=f"{aqi_value:.0f}", color=color), unsafe_allow_html=True)
+
+				# Column 3: PM2.5
+				col3.markdown(card_style(label="PM2.5", value=f"{pm_value:.1f} µg/m³"), unsafe_allow_html=True)
+				st.markdown("<br>", unsafe_allow_html=True)
 
-			with st.container(key="right_box_low"):
-				# Bottom 5
+			with st.container(key="time_series"):
+				# 📈 Time series
 				st.markdown("""
 				<div style="font-size: 18px; font-weight: 600; margin-bottom: 10px;">
-					Lowest AQI Today
+					Time Series
 				</div>
+
 				<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
-					Top 5 region with the lowest PM2.5 and AQI for today
+						Hourly PM2.5 and AQI time series for today
 				</div>
 				""", unsafe_allow_html=True)
-				low5_today = df_today_avg.sort_values("aqi", ascending=True).head(5)
-				low5_today = low5_today.rename(columns={"PM2.5": "pm25"})
-
-				for i, row in enumerate(low5_today.itertuples(index=False), start=1):
-					station = row.station
-					aqi = row.aqi
-					pm25 = row.pm25
-					color = row.color
-
+				st.markdown("<br>", unsafe_allow_html=True)
+
+				st.line_chart(station_df.set_index("time")[["aqi", "PM2.5"]],width=700,height=250,use_container_width=True)
+
+			weekly_chart(selected_station)
+			station_history(selected_station)
+
+	# RIGHT COLUMN: Top and bottom 5 stations. Only depends on today's data, so
+	# map and station interactions never recompute it.
+	@st.fragment
+	def leaderboards():
+		with perf.fragment("monitor.leaderboard"):
+			# Compute daily averages per station
+			top5_today, low5_today = station_leaderboard(df_today)
+
+			for key, title, subtitle, rows in [
+				("right_box", "Highest AQI Today", "Top 5 region with the highest PM2.5 and AQI for today", top5_today),
+				("right_box_low", "Lowest AQI Today", "Top 5 region with the lowest PM2.5 and AQI for today", low5_today)
+			]:
+				with st.container(key=key):
 					st.markdown(f"""
-					<div style="
-						background-color: #fdfdfd;
-						border-left: 5px solid {color};
-						padding: 14px 14px;
-						border-radius: 8px;
-						margin-bottom: 10px;
-						box-shadow: 0 1px 2px rgba(0,0,0,0.08);
-					">
-						<div style="font-size: 14px; font-weight: bold;">
-							#{i} {station}
-						</div>
-						<div style="font-size: 12px;">
-							AQI: <b>{int(aqi)}</b> | PM2.5: <b>{pm25:.1f} µg/m³</b>
-						</div>
+					<div style="font-size: 18px; font-weight: 600; margin-bottom: 10px;">
+						{title}
+					</div>
+					<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
+						{subtitle}
 					</div>
 					""", unsafe_allow_html=True)
-					
+					rows = rows.assign(color=rows["aqi"].apply(get_rgba_color))
+
+					for i, row in enumerate(rows.itertuples(index=False), start=1):
+						st.markdown(f"""
+						<div style="
+							background-color: #fdfdfd;
+							border-left: 5px solid {row.color};
+							padding: 14px 14px;
+							border-radius: 8px;
+							margin-bottom: 10px;
+							box-shadow: 0 1px 2px rgba(0,0,0,0.08);
+						">
+							<div style="font-size: 14px; font-weight: bold;">
+								#{i} {row.station}
+							</div>
+							<div style="font-size: 12px;">
+								AQI: <b>{int(row.aqi)}</b> | PM2.5: <b>{row.pm25:.1f} µg/m³</b>
+							</div>
+						</div>
+						""", unsafe_allow_html=True)
+
+	with left_col:
+		station_detail()
+	with right_col:
+		leaderboards()
 
 
 # 📁 PAGE 2: FILTER & DOWNLOAD
@@ -672,30 +740,24 @@ elif page == "Download Data":
 							</div>
 						""", unsafe_allow_html=True)
 
-		@st.cache_data(show_spinner=True)
+		@perf.timed()
+		@cache.cached(ttl=3600)
 		def load_all_data():
-			conn = get_connection()
-
-			query = """
-				SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
-				FROM tes
-			"""
+			return db.load_all_data()
 
-			df = pd.read_sql(query, conn)
-			conn.close()
-			return df
-
-		df_all = load_all_data()
+		with st.spinner("Loading data..."):
+			df_all = load_all_data()
+			all_index = index_for(df_all)
 		# -------------------------------
 		# 2️⃣ Filters for convenience
 		# -------------------------------
 		with st.form("filter_form"):
 			# Source ID filter
-			source_id_options = sorted(df_all["sourceid"].unique())
+			source_id_options = sorted(all_index.stations_by_source)
 			source_id = st.selectbox("Source ID", options=source_id_options)
 
 			# Stations filter based on selected source
-			station_options = sorted(df_all[df_all["sourceid"] == source_id]["station"].unique())
+			station_options = all_index.stations_by_source[source_id]
 			station_filter = st.multiselect("Station", options=station_options)
 
 			# Date range filter
@@ -705,13 +767,9 @@ elif page == "Download Data":
 			submit = st.form_submit_button("Apply Filters")
 
 	# Apply filters
-	filtered = df_all.copy()
-	if station_filter:
-		filtered = filtered[filtered["station"].isin(station_filter)]
-
-	if len(date_range) == 2:
-		start, end = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-		filtered = filtered[(filtered["time"] >= start) & (filtered["time"] <= end)]
+	perf.section("download.filter")
+	start, end = (pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])) if len(date_range) == 2 else (None, None)
+	filtered = all_index.select(df_all, station_filter or None, start, end)
 		
 	st.write(f"Filtered rows: {len(filtered)}")
 	# Pagination setup
@@ -740,12 +798,24 @@ elif page == "Download Data":
 			st.session_state.page_num += 1
 
 	# Paginate the dataframe
+	perf.section("download.table")
 	start = (st.session_state.page_num - 1) * page_size
 	end = start + page_size
 	st.dataframe(filtered.iloc[start:end])
 
-	csv = filtered.to_csv(index=False).encode('utf-8')
-	st.download_button("Download as CSV", data=csv, file_name="air_quality_filtered.csv", mime="text/csv")
+	# The CSV is only built when the button is clicked, on Streamlit's download
+	# thread, and kept per data version and filters so pagination reruns and
+	# repeat downloads never serialize the dataset again
+	csv_key = cache.make_key("download_csv", (
+		len(df_all), str(df_all["time"].max()), tuple(sorted(station_filter)), tuple(str(d) for d in date_range)
+	), {})
+
+	def filtered_csv():
+		return cache.memory.get_or_compute(
+			"download_csv", csv_key, lambda: filtered.to_csv(index=False).encode('utf-8'), ttl=3600
+		)
+
+	st.download_button("Download as CSV", data=filtered_csv, file_name="air_quality_filtered.csv", mime="text/csv")
 
 
 
@@ -785,55 +855,23 @@ elif page == "AOD Derived PM2.5 Heatmap":
 		st.markdown("<br>", unsafe_allow_html=True)
 
 
+	@perf.timed()
+	@cache.cached(ttl=3600)
 	def load_df_10():
-		conn = get_connection()
-
-		query = """
-			SELECT station, "PM2.5", latitude, longitude, time
-			FROM tes
-			WHERE EXTRACT(HOUR FROM time) = 10
-		"""
-		df_10 = pd.read_sql(query, conn)
-		conn.close()
+		return db.load_df_10()
 
-		df_10['date'] = pd.to_datetime(df_10['time']).dt.normalize()
-		return df_10
-
-	df_10 = load_df_10()
-
-
-	def load_df_pm25():
-		conn = get_connection()
-
-		query = """
-			WITH valid_rows AS (
-				SELECT date, latitude, longitude, mean_aod, pm25_xgb, pm25_rf, pm25_lgbm
-				FROM hourly_data
-				WHERE latitude IS NOT NULL
-				AND longitude IS NOT NULL
-				AND pm25_xgb IS NOT NULL
-				AND pm25_rf IS NOT NULL
-				AND pm25_lgbm IS NOT NULL
-			),
-			filtered_dates AS (
-				SELECT date
-				FROM valid_rows
-				GROUP BY date
-				HAVING COUNT(*) >= 75
-			)
-			SELECT v.*
-			FROM valid_rows v
-			JOIN filtered_dates f ON v.date = f.date
-		"""
 
-		df_pm25 = pd.read_sql(query, conn)
-		conn.close()
+	@perf.timed()
+	@cache.cached(ttl=3600)
+	def load_df_pm25(grid_version):
+		return db.load_df_pm25()
 
-		df_pm25['date'] = pd.to_datetime(df_pm25['date'])
-		return df_pm25
-
-	df_pm25 = load_df_pm25()
-	available_dates = sorted(df_pm25['date'].dt.date.unique(), reverse=True)
+	# Station readings and grid predictions are independent, so fetch them side by side
+	aod_grid_version = grid_version()
+	with perf.span("aod.load"):
+		loaded = db.fetch_concurrently(df_10=load_df_10, df_pm25=lambda: load_df_pm25(aod_grid_version))
+	df_10, df_pm25 = loaded["df_10"], loaded["df_pm25"]
+	available_dates = sorted(df_pm25["date"].drop_duplicates().dt.date, reverse=True)
 
 
 	css = """
@@ -861,20 +899,15 @@ elif page == "AOD Derived PM2.5 Heatmap":
 		)
 
 		# Map the selection to the corresponding column name
-		model_column_map = {
-			"XGBoost": "pm25_xgb",
-			"Random Forest": "pm25_rf",
-			"LightGBM": "pm25_lgbm"
-		}
-		pm_column = model_column_map[model_option]
+		pm_column = MODEL_COLUMNS[model_option]
 
 		# Date selection
 		selected_date = st.selectbox("Select a date", available_dates)
 		st.markdown("<br>", unsafe_allow_html=True)
 
 		# Filter and prepare data
-		selected_df = df_pm25[df_pm25['date'].dt.date == selected_date]
-		selected_df = selected_df.dropna(subset=["latitude", "longitude", pm_column])
+		perf.section("aod.heatmap")
+		selected_df = heatmap_points(df_pm25, selected_date, pm_column)
 		heat_data = selected_df[["latitude", "longitude", pm_column]].values.tolist()
 
 		# Map setup
@@ -885,7 +918,8 @@ elif page == "AOD Derived PM2.5 Heatmap":
 		HeatMap(heat_data, radius=15, blur=20, max_zoom=15).add_to(m)
 
 		# Show map
-		st_folium(m, height=500, use_container_width=True)
+		with perf.span("aod.heatmap.st_folium"):
+			st_folium(m, height=500, use_container_width=True)
 
 		# Dynamic legend values
 		pm_values = selected_df[pm_column].values
@@ -923,6 +957,120 @@ elif page == "AOD Derived PM2.5 Heatmap":
 		st.markdown(legend_html, unsafe_allow_html=True)
 
 
+	@perf.timed()
+	@cache.cached(ttl=3600)
+	def load_grid(date, grid_version):
+		return db.load_grid(date)
+
+	# Build the KD-tree for a date once and reuse it for every lookup
+	@st.cache_resource(ttl=3600, max_entries=14)
+	def load_grid_index(date, grid_version):
+		return GridIndex(load_grid(date, grid_version))
+
+	def get_grid_index(date):
+		return load_grid_index(date, aod_grid_version)
+
+	csspoint = """
+		.st-key-point_query {
+			background-color: white;
+			padding: 20px;
+			border-radius: 10px;
+			margin-bottom: 20px;
+		}
+		"""
+	st.html(f"<style>{csspoint}</style>")
+
+	perf.section("aod.point_query")
+	with st.container(key="point_query"):
+		st.markdown(f"""
+			<div style="font-size:16px; font-weight:500; margin-bottom:10px;">
+				Estimate PM2.5 at a Coordinate
+			</div>
+			<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
+				Enter one latitude, longitude pair per line. Each point is estimated from the nearest grid cells of the
+				selected date and model using inverse-distance weighting.
+			</div>
+		""", unsafe_allow_html=True)
+
+		coords_text = st.text_area("Coordinates (lat, lon)", value="-6.2000, 106.8166", height=120)
+
+		try:
+			points_df = parse_coordinates(coords_text)
+		except ValueError as e:
+			st.error(str(e))
+			points_df = None
+
+		if points_df is not None and not points_df.empty:
+			grid_index = get_grid_index(selected_date)
+			points_df[f"{model_option} PM2.5"] = grid_index.estimate(
+				points_df["latitude"].values, points_df["longitude"].values, pm_column
+			).round(1)
+			points_df["Nearest Cell (m)"] = grid_index.nearest_distance(
+				points_df["latitude"].values, points_df["longitude"].values
+			).round(0)
+			st.dataframe(points_df, use_container_width=True)
+
+			if points_df[f"{model_option} PM2.5"].isna().any():
+				st.caption("Points without a grid cell within 1.5 km are outside the prediction area and left empty.")
+
+	cssbulk = """
+		.st-key-bulk_upload {
+			background-color: white;
+			padding: 20px;
+			border-radius: 10px;
+			margin-bottom: 20px;
+		}
+		"""
+	st.html(f"<style>{cssbulk}</style>")
+
+	perf.section("aod.bulk_upload")
+	with st.container(key="bulk_upload"):
+		st.markdown(f"""
+			<div style="font-size:16px; font-weight:500; margin-bottom:10px;">
+				Bulk Exposure Estimates
+			</div>
+			<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
+				Upload a CSV or Parquet file of sites with latitude and longitude columns. Every site is scored with all
+				three models for each available date in the range, and the result can be downloaded as a CSV.
+			</div>
+		""", unsafe_allow_html=True)
+
+		sites_file = st.file_uploader("Sites file", type=["csv", "parquet"])
+		bulk_range = st.date_input("Date range (optional)", [], key="bulk_range")
+
+		if sites_file is not None:
+			try:
+				sites = read_sites(sites_file, sites_file.name)
+			except ValueError as e:
+				st.error(str(e))
+				sites = None
+
+			if sites is not None:
+				if len(bulk_range) == 2:
+					bulk_dates = [d for d in sorted(available_dates) if bulk_range[0] <= d <= bulk_range[1]]
+				else:
+					bulk_dates = [selected_date]
+
+				st.write(f"{len(sites):,} sites × {len(bulk_dates)} dates")
+
+				# Results are only offered for the file and dates they were computed from
+				bulk_key = (sites_file.file_id, tuple(bulk_dates))
+
+				if bulk_dates and st.button("Score sites"):
+					with st.spinner("Scoring sites..."):
+						try:
+							st.session_state.bulk_csv = (bulk_key, sites_to_csv(score_sites(sites, bulk_dates, get_grid_index)))
+						except ValueError as e:
+							st.error(str(e))
+
+				if st.session_state.get("bulk_csv", (None,))[0] == bulk_key:
+					st.download_button(
+						"Download estimates as CSV",
+						data=st.session_state.bulk_csv[1],
+						file_name="pm25_site_estimates.csv",
+						mime="text/csv"
+					)
+
 	# Optional: show table
 	csstab = """
 		.st-key-table {
@@ -937,78 +1085,40 @@ elif page == "AOD Derived PM2.5 Heatmap":
 		with st.expander("Show raw data"):
 			st.dataframe(selected_df)
 
-	df_10['date'] = pd.to_datetime(df_10['time']).dt.date
-
-	df_pm25['date'] = pd.to_datetime(df_pm25['date']).dt.date
-
-	# Keep only rows with valid PM2.5 and coordinates
-	real_df_all = df_10.dropna(subset=["latitude", "longitude", "PM2.5"])
-	aod_df_all = df_pm25.dropna(subset=["latitude", "longitude", pm_column])
-
-	# Step 1: Filter to overlapping dates
-	shared_dates = set(real_df_all['date']).intersection(set(aod_df_all['date']))
-	real_df_all = real_df_all[real_df_all['date'].isin(shared_dates)]
-	aod_df_all = aod_df_all[aod_df_all['date'].isin(shared_dates)]
-
-	if real_df_all.empty or aod_df_all.empty:
-		st.warning("No matching dates between real and AOD-derived datasets.")
-	else:
-		# Step 2: Convert to GeoDataFrames
-		gdf_real = gpd.GeoDataFrame(
-			real_df_all.copy(),
-			geometry=gpd.points_from_xy(real_df_all["longitude"], real_df_all["latitude"]),
-			crs="EPSG:4326"
-		)
-		gdf_aod = gpd.GeoDataFrame(
-			aod_df_all.copy(),
-			geometry=gpd.points_from_xy(aod_df_all["longitude"], aod_df_all["latitude"]),
-			crs="EPSG:4326"
+	# Pair grid cells with station readings (same date, within ~880 m). The
+	# pairs and every model's scores only change with the loaded data, so
+	# switching models or comparing them reuses one computation.
+	perf.section("aod.evaluation")
+	evaluation_key = cache.make_key("aod_evaluation", (
+		len(df_10), str(df_10["time"].max()), len(df_pm25), str(df_pm25["date"].max()), aod_grid_version
+	), {})
+
+	with perf.span("aod.match_predictions"):
+		gdf_matched, model_scores = cache.memory.get_or_compute(
+			"aod_evaluation", evaluation_key,
+			lambda: evaluate_models(df_10, df_pm25, list(MODEL_COLUMNS.values())), ttl=3600
 		)
 
-		# Step 3: Reproject to meters
-		gdf_real = gdf_real.to_crs(epsg=3857)
-		gdf_aod = gdf_aod.to_crs(epsg=3857)
-
-		# Step 4: Nearest spatial join (within 1.1 km)
-		gdf_matched = gpd.sjoin_nearest(
-			gdf_aod,
-			gdf_real,
-			how='inner',
-			max_distance=880,
-			distance_col="distance_m"
+	if gdf_matched.empty:
+		st.warning("No spatiotemporal matches found (same date and within 1.1 km).")
+	else:
+		# Metrics for the selected model
+		mae, rmse, r2 = (model_scores[pm_column][k] for k in ("mae", "rmse", "r2"))
+		matched_real = gdf_matched["PM2.5"]
+
+		scatter_df = pd.DataFrame({
+			"station": gdf_matched["station"],
+			"latitude": gdf_matched["latitude_right"].round(4),
+			"longitude": gdf_matched["longitude_right"].round(4),
+			"Real PM2.5": gdf_matched["PM2.5"],
+			f"{model_option} PM2.5": gdf_matched[pm_column]  # <- dynamic column name
+		})
+
+		scatter_df["Absolute Error"] = np.abs(
+			scatter_df["Real PM2.5"] - scatter_df[f"{model_option} PM2.5"]
 		)
-
-		if gdf_matched.empty:
-			st.warning("No spatially matched points found within 1.1 km.")
-		else:
-			# Step 5: Filter matched rows to have same date
-			gdf_matched = gdf_matched[gdf_matched["date_left"] == gdf_matched["date_right"]]
-
-			if gdf_matched.empty:
-				st.warning("No spatiotemporal matches found (same date and within 1.1 km).")
-			else:
-				# Step 6: Extract matched values
-				matched_real = gdf_matched["PM2.5"]
-				matched_est = gdf_matched[pm_column]  # <- dynamic model column
-
-				# Metrics
-				mae = np.abs(matched_real - matched_est).mean()
-				rmse = np.sqrt(mean_squared_error(matched_real, matched_est))
-				r2 = r2_score(matched_real, matched_est)
-
-				scatter_df = pd.DataFrame({
-					"station": gdf_matched["station"],
-					"latitude": gdf_matched["latitude_right"].round(4),
-					"longitude": gdf_matched["longitude_right"].round(4),
-					"Real PM2.5": gdf_matched["PM2.5"],
-					f"{model_option} PM2.5": gdf_matched[pm_column]  # <- dynamic column name
-				})
-
-				scatter_df["Absolute Error"] = np.abs(
-					scatter_df["Real PM2.5"] - scatter_df[f"{model_option} PM2.5"]
-				)
-				scatter_df = scatter_df.sort_values(by="Absolute Error", ascending=True)
-				scatter_df.set_index("station", inplace=True)
+		scatter_df = scatter_df.sort_values(by="Absolute Error", ascending=True)
+		scatter_df.set_index("station", inplace=True)
 
 
 		csscat = """
@@ -1059,7 +1169,7 @@ elif page == "AOD Derived PM2.5 Heatmap":
 
 			# Calculate mean absolute error per station
 			station_mae = (
-				scatter_df.groupby("station")["Absolute Error"]
+				scatter_df.groupby("station", observed=True)["Absolute Error"]
 				.mean()
 				.reset_index()
 				.rename(columns={"Absolute Error": "MAE"})
@@ -1105,7 +1215,54 @@ elif page == "AOD Derived PM2.5 Heatmap":
 
 			st.altair_chart(chart, use_container_width=True)
 
+		# ⚖️ Every model scored on the same pairs, side by side
+		csscompare = """
+				.st-key-model_comparison {
+					background-color: white;
+					padding: 20px;
+					width: 100%;
+					border-radius: 10px;
+					margin-bottom: 20px;
+				}
+				"""
+		st.html(f"<style>{csscompare}</style>")
 
+		with st.container(key="model_comparison"):
+			st.markdown("""
+			<div style="font-size:16px; font-weight:500; margin-bottom:10px;">
+				Model Comparison
+			</div>
+
+			<div style="font-size:14px; font-weight:300; margin-bottom:10px;">
+				XGBoost, Random Forest and LightGBM evaluated against the same station readings.
+			</div>
+			""", unsafe_allow_html=True)
+
+			if st.toggle("Compare all models", key="aod_compare_models"):
+				model_names = {column: name for name, column in MODEL_COLUMNS.items()}
+				model_columns = list(model_names)
+
+				scores_df = pd.DataFrame.from_dict(model_scores, orient="index").rename(
+					index=model_names,
+					columns={"mae": "MAE (µg/m³)", "rmse": "RMSE", "r2": "R²", "n": "Sample Size"}
+				)
+				st.dataframe(scores_df.round(3), use_container_width=True)
+
+				# Mean absolute error per station, grouped by model
+				station_errors = error_breakdown(gdf_matched, model_columns, "station").rename(columns=model_names)
+				station_df = station_errors.reset_index().melt(id_vars="station", var_name="Model", value_name="MAE")
+				station_chart = alt.Chart(station_df).mark_bar().encode(
+					x=alt.X("station:N", sort=station_errors.mean(axis=1).sort_values().index.tolist(), title="Stations"),
+					xOffset="Model:N",
+					y=alt.Y("MAE:Q", title="Mean Absolute Error (µg/m³)"),
+					color=alt.Color("Model:N", legend=alt.Legend(title="Model")),
+					tooltip=["station", "Model", alt.Tooltip("MAE:Q", format=".2f")]
+				).properties(height=350, width=700)
+				st.altair_chart(station_chart, use_container_width=True)
+
+				# Daily mean absolute error of each model
+				daily_errors = error_breakdown(gdf_matched, model_columns, "date_left").rename(columns=model_names)
+				st.line_chart(daily_errors.rename_axis("date"), height=250, use_container_width=True)
 
 
 elif page == "About":
@@ -1165,3 +1322,34 @@ elif page == "About":
 				<p>Connect with me on <a href="https://www.linkedin.com/in/yourprofile/" target="_blank">LinkedIn</a>.</p>
 			</div>
 			""", unsafe_allow_html=True)
+
+
+# ⏱ Close this rerun's profile and timings; PERF_DEBUG=1 or ?perf=1 shows the
+# timings in the sidebar
+if profiler is not None:
+	report = profiler.stop()
+	with st.sidebar.expander("Profile", expanded=True):
+		st.markdown(f"Rerun: {report.seconds:.2f} s, peak traced memory: {report.peak_bytes / 1e6:.1f} MB")
+		st.download_button("Download report", data=report.text, file_name="rerun_profile.txt", mime="text/plain")
+		st.download_button("Download .prof (snakeviz, flameprof)", data=report.stats, file_name="rerun.prof", mime="application/octet-stream")
+		st.code(report.text, language=None)
+
+rerun = perf.finish()
+if perf.DEBUG or st.query_params.get("perf") == "1":
+	with st.sidebar.expander("Performance", expanded=True):
+		st.markdown(f"**{rerun.page}**: {rerun.total_ms:.0f} ms")
+		st.dataframe(
+			pd.DataFrame(rerun.spans, columns=["name", "kind", "start_ms", "ms", "thread"]),
+			hide_index=True,
+			use_container_width=True
+		)
+		# Size of the last frame each loader returned (schema.apply_schema)
+		st.markdown("**Loaded frames**")
+		st.dataframe(
+			pd.DataFrame(
+				[(name, round(size / 1e6, 2)) for name, size in sorted(schema.frame_sizes.items())],
+				columns=["loader", "MB"]
+			),
+			hide_index=True,
+			use_container_width=True
+		)
@@ -0,0 +1,351 @@
+# Loader cache shared between Streamlit replicas.
+#
+# st.cache_data lives inside one process, so every replica behind nginx would
+# run the same queries and keep its own copy of each frame. The backends here
+# keep one copy per dataset outside the process:
+#
+#   CACHE_BACKEND=none     no shared tier (default, same as before)
+#   CACHE_BACKEND=local    in-process dict, a stand-in for development
+#   CACHE_BACKEND=parquet  Parquet files in CACHE_DIR, e.g. a volume mounted
+#                          into every replica
+#   CACHE_BACKEND=redis    Parquet bytes in Redis at REDIS_URL (needs the
+#                          optional `redis` package)
+#
+# In front of that sits a per-process memory tier with a byte budget
+# (CACHE_BUDGET_MB), so the frames a replica keeps can't grow past the
+# container's memory limit however many filters and users hit it.
+
+import fcntl
+import functools
+import hashlib
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+
+import pandas as pd
+
+from schema import frame_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(name, args, kwargs):
+	digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode("utf-8")).hexdigest()[:16]
+	return f"{name}-{digest}"
+
+
+def to_parquet_bytes(df):
+	buffer = io.BytesIO()
+	df.to_parquet(buffer, index=False)
+	return buffer.getvalue()
+
+
+class LocalBackend:
+	# In-process stand-in with the same interface as the shared backends
+
+	def __init__(self):
+		self._items = {}
+		self._locks = {}
+		self._guard = threading.Lock()
+
+	def get(self, key, ttl):
+		item = self._items.get(key)
+		if item is None or time.time() - item[0] > ttl:
+			return None
+		return item[1]
+
+	def set(self, key, df, ttl):
+		now = time.time()
+		for stale in [k for k, (stamp, _) in self._items.items() if now - stamp > ttl]:
+			del self._items[stale]
+		self._items[key] = (now, df)
+
+	@contextmanager
+	def lock(self, key):
+		with self._guard:
+			lock = self._locks.setdefault(key, threading.Lock())
+		with lock:
+			yield
+
+	def clear(self):
+		self._items.clear()
+
+
+class ParquetBackend:
+	# One Parquet file per key. Writes go through a temp file and os.replace so
+	# readers never see a partial file; a per-key flock makes sure only one
+	# replica runs the query when an entry expires. Each file's mtime is set to
+	# its expiry time, and expired files are deleted with their lock files on
+	# read and on every write, so keys that are never asked for again (an old
+	# grid version, a one-off filter) don't fill the volume.
+
+	def __init__(self, directory):
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+
+	def path(self, key):
+		return os.path.join(self.directory, f"{key}.parquet")
+
+	def lock_path(self, key):
+		return os.path.join(self.directory, f"{key}.lock")
+
+	def get(self, key, ttl):
+		path = self.path(key)
+		try:
+			if os.path.getmtime(path) < time.time():
+				self.remove(key)
+				return None
+			return pd.read_parquet(path, memory_map=True)
+		except (FileNotFoundError, OSError):
+			return None
+
+	def set(self, key, df, ttl):
+		path = self.path(key)
+		tmp = f"{path}.{os.getpid()}.tmp"
+		df.to_parquet(tmp, index=False)
+		expires = time.time() + ttl
+		os.utime(tmp, (expires, expires))
+		os.replace(tmp, path)
+		self.sweep()
+
+	def remove(self, key):
+		# Delete an expired entry, and its lock file unless another replica
+		# holds it right now (it is then removed by a later sweep)
+		with suppress(FileNotFoundError):
+			os.remove(self.path(key))
+		try:
+			f = open(self.lock_path(key))
+		except FileNotFoundError:
+			return
+		with f:
+			try:
+				fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+			except BlockingIOError:
+				return
+			with suppress(FileNotFoundError):
+				os.remove(self.lock_path(key))
+
+	def sweep(self):
+		now = time.time()
+		for name in os.listdir(self.directory):
+			key, ext = os.path.splitext(name)
+			if ext not in (".parquet", ".lock"):
+				continue
+			try:
+				expired = os.path.getmtime(self.path(key)) < now
+			except FileNotFoundError:
+				# A lock file left behind by a loader that failed
+				expired = ext == ".lock"
+			if expired:
+				self.remove(key)
+
+	@contextmanager
+	def lock(self, key):
+		with open(self.lock_path(key), "w") as f:
+			fcntl.flock(f, fcntl.LOCK_EX)
+			try:
+				yield
+			finally:
+				fcntl.flock(f, fcntl.LOCK_UN)
+
+	def clear(self):
+		for name in os.listdir(self.directory):
+			if name.endswith(".parquet"):
+				os.remove(os.path.join(self.directory, name))
+
+
+class RedisBackend:
+	def __init__(self, url, prefix="aqi:"):
+		try:
+			import redis
+		except ImportError:
+			raise RuntimeError("CACHE_BACKEND=redis needs the `redis` package (pip install redis)")
+		self.client = redis.Redis.from_url(url)
+		self.prefix = prefix
+
+	def get(self, key, ttl):
+		payload = self.client.get(self.prefix + key)
+		if payload is None:
+			return None
+		return pd.read_parquet(io.BytesIO(payload))
+
+	def set(self, key, df, ttl):
+		self.client.set(self.prefix + key, to_parquet_bytes(df), ex=int(ttl))
+
+	@contextmanager
+	def lock(self, key):
+		with self.client.lock(self.prefix + key + ":lock", timeout=600, blocking_timeout=600):
+			yield
+
+	def clear(self):
+		for key in self.client.scan_iter(self.prefix + "*"):
+			self.client.delete(key)
+
+
+def create_backend():
+	kind = os.environ.get("CACHE_BACKEND", "none").lower()
+	if kind == "none":
+		return None
+	if kind == "parquet":
+		return ParquetBackend(os.environ.get("CACHE_DIR", "/tmp/aqi-cache"))
+	if kind == "redis":
+		return RedisBackend(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+	if kind == "local":
+		return LocalBackend()
+	raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+backend = create_backend()
+
+
+def fetch(fn, *args, ttl=3600, **kwargs):
+	# Return fn(*args) from the shared cache. The first replica to miss runs
+	# the loader under the key's lock; the others wait and then read the stored
+	# copy instead of querying Postgres again.
+	if backend is None:
+		return fn(*args, **kwargs)
+
+	key = make_key(fn.__name__, args, kwargs)
+	df = backend.get(key, ttl)
+	if df is not None:
+		return df
+
+	with backend.lock(key):
+		df = backend.get(key, ttl)
+		if df is None:
+			df = fn(*args, **kwargs)
+			backend.set(key, df, ttl)
+	return df
+
+
+def object_bytes(value):
+	if isinstance(value, pd.DataFrame):
+		return frame_bytes(value)
+	if isinstance(value, (tuple, list)):
+		return sum(object_bytes(item) for item in value)
+	if hasattr(value, "nbytes"):
+		return int(value.nbytes)
+	return sys.getsizeof(value)
+
+
+class MemoryCache:
+	# LRU of loader results bounded by their real in-memory size. Values are
+	# shared between sessions rather than copied, so callers must not modify
+	# returned frames in place.
+
+	def __init__(self, budget_bytes):
+		self.budget_bytes = budget_bytes
+		self.used_bytes = 0
+		self._items = OrderedDict()
+		self._lock = threading.Lock()
+		self._key_locks = {}
+		self.stats = {}
+
+	def _stat(self, name):
+		return self.stats.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0})
+
+	def get(self, name, key, count=True):
+		with self._lock:
+			item = self._items.get(key)
+			if item is not None and time.time() < item[0]:
+				self._items.move_to_end(key)
+				if count:
+					self._stat(name)["hits"] += 1
+				return item[2]
+			if item is not None:
+				self._remove(key)
+			if count:
+				self._stat(name)["misses"] += 1
+			return None
+
+	def put(self, name, key, value, ttl):
+		size = object_bytes(value)
+		with self._lock:
+			if key in self._items:
+				self._remove(key)
+			if size > self.budget_bytes:
+				logger.warning("%s result (%.1f MB) is larger than the cache budget; not cached", name, size / 1e6)
+				return
+
+			while self.used_bytes + size > self.budget_bytes and self._items:
+				self._evict()
+
+			self._items[key] = (time.time() + ttl, name, value, size)
+			self.used_bytes += size
+			self._stat(name)["bytes"] += size
+
+	def get_or_compute(self, name, key, compute, ttl):
+		# The cached value, or compute() run once however many sessions ask
+		# for the same key at the same time
+		value = self.get(name, key)
+		if value is not None:
+			return value
+
+		with self.lock(key):
+			value = self.get(name, key, count=False)
+			if value is None:
+				value = compute()
+				self.put(name, key, value, ttl)
+		return value
+
+	@contextmanager
+	def lock(self, key):
+		# One lock per key, dropped once nobody holds or waits for it, so
+		# one-off keys (every Download filter) don't pile up
+		with self._lock:
+			entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+			entry[1] += 1
+		try:
+			with entry[0]:
+				yield
+		finally:
+			with self._lock:
+				entry[1] -= 1
+				if not entry[1]:
+					del self._key_locks[key]
+
+	def _remove(self, key):
+		_, name, _, size = self._items.pop(key)
+		self.used_bytes -= size
+		self._stat(name)["bytes"] -= size
+
+	def _evict(self):
+		key, (_, name, _, size) = next(iter(self._items.items()))
+		self._remove(key)
+		self._stat(name)["evictions"] += 1
+		logger.info("Evicted %s (%.1f MB) to stay under the cache budget", name, size / 1e6)
+
+	def clear(self):
+		with self._lock:
+			for key in list(self._items):
+				self._remove(key)
+
+	def summary(self):
+		with self._lock:
+			return {
+				"budget_bytes": self.budget_bytes,
+				"used_bytes": self.used_bytes,
+				"entries": len(self._items),
+				"loaders": {name: dict(stat) for name, stat in self.stats.items()}
+			}
+
+
+memory = MemoryCache(int(float(os.environ.get("CACHE_BUDGET_MB", 400)) * 1024 * 1024))
+
+
+def cached(ttl=3600):
+	# Memory tier for loaders, backed by the shared tier via fetch()
+	def decorator(fn):
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			name = fn.__name__
+			key = make_key(name, args, kwargs)
+			return memory.get_or_compute(name, key, lambda: fetch(fn, *args, ttl=ttl, **kwargs), ttl)
+		return wrapper
+	return decorator
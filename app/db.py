@@ -0,0 +1,255 @@
+# Database access shared by the Streamlit app (app.py) and the JSON API (api.py).
+# Functions here are plain loaders; each caller adds its own caching on top.
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import telemetry
+from schema import apply_schema
+from storage import ITERSIZE, POOL_MAX, create_storage, pooled_connection  # noqa: F401
+
+
+# The engine queries run on: Postgres, or DuckDB over Parquet files
+storage = create_storage()
+
+_executor = ThreadPoolExecutor(max_workers=POOL_MAX, thread_name_prefix="db")
+
+
+def read_sql(query, params=None, method="sql", name=None):
+	# name groups the query's telemetry; defaults to the SQL text itself
+	start = time.perf_counter()
+	df = storage.read(query, params, method=method)
+	telemetry.record(
+		name or telemetry.normalize_sql(query), query, params, time.perf_counter() - start,
+		len(df), telemetry.approximate_bytes(df), explain=lambda: storage.explain(query, params)
+	)
+	return df
+
+
+def iter_frames(query, params=None, itersize=ITERSIZE, table=None, name=None):
+	# Yield the result in DataFrame chunks, so peak memory is bounded by
+	# itersize rather than by the table size. Telemetry times the fetches
+	# only, not the consumer between chunks, so a slow client downloading an
+	# export doesn't make the query look slow.
+	frames = storage.iter_frames(query, params, itersize=itersize)
+	seconds = 0.0
+	rows = nbytes = 0
+	try:
+		while True:
+			start = time.perf_counter()
+			df = next(frames, None)
+			seconds += time.perf_counter() - start
+			if df is None:
+				break
+			rows += len(df)
+			nbytes += telemetry.approximate_bytes(df)
+			yield apply_schema(df, table) if table else df
+	finally:
+		# Release the cursor and pooled connection now, even if the consumer stopped early
+		frames.close()
+		telemetry.record(
+			name or telemetry.normalize_sql(query), query, params, seconds,
+			rows, nbytes, explain=lambda: storage.explain(query, params)
+		)
+
+
+def fetch_concurrently(**calls):
+	# Run independent loaders side by side on the pool, e.g.
+	#   fetch_concurrently(today=load_data, week=lambda: load_weekly_data(a, b))
+	# The page then waits for the slowest query instead of the sum of all of them.
+	# Each call runs in a copy of the caller's context, so perf spans recorded
+	# inside it are attributed to the caller's rerun.
+	futures = {name: _executor.submit(contextvars.copy_context().run, fn) for name, fn in calls.items()}
+	return {name: future.result() for name, future in futures.items()}
+
+
+def load_data(today=None):
+	# Use today's date if not provided
+	if today is None:
+		today = datetime.now().strftime('%Y-%m-%d')
+
+	# Only select needed columns and filter to today
+	query = """
+		SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
+		FROM tes
+		WHERE time >= %s
+		  AND aqi IS NOT NULL
+		  AND aqi != 0
+		ORDER BY station, time
+	"""
+	return apply_schema(read_sql(query, (f"{today} 00:00:00",), name="load_data"), "tes", "load_data")
+
+
+def load_weekly_data(start_of_week, end_of_week):
+	query = """
+		SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
+		FROM tes
+		WHERE time BETWEEN %s AND %s
+		AND aqi IS NOT NULL
+		AND aqi != 0
+		ORDER BY station, time
+	"""
+	return apply_schema(read_sql(query, (start_of_week, end_of_week), name="load_weekly_data"), "tes", "load_weekly_data")
+
+
+def load_station_series(station, start, end):
+	query = """
+		SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
+		FROM tes
+		WHERE station = %s
+		AND time BETWEEN %s AND %s
+		AND aqi IS NOT NULL
+		AND aqi != 0
+		ORDER BY time
+	"""
+	return apply_schema(read_sql(query, (station, start, end), name="load_station_series"), "tes", "load_station_series")
+
+
+def load_station_history(station, start, end, bucket):
+	# Mean AQI and PM2.5 of one station per hour, day or week, aggregated by
+	# the database so long ranges never come back as raw readings
+	if bucket not in ("hour", "day", "week"):
+		raise ValueError(f"bucket must be hour, day or week, not {bucket!r}")
+	query = f"""
+		SELECT date_trunc('{bucket}', time) AS time, AVG(aqi) AS aqi, AVG("PM2.5") AS "PM2.5", COUNT(*) AS readings
+		FROM tes
+		WHERE station = %s
+		AND time BETWEEN %s AND %s
+		AND aqi IS NOT NULL
+		AND aqi != 0
+		GROUP BY 1
+		ORDER BY 1
+	"""
+	return apply_schema(read_sql(query, (station, start, end), name=f"load_station_history.{bucket}"), "tes", "load_station_history")
+
+
+def load_all_data():
+	query = """
+		SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
+		FROM tes
+		ORDER BY station, time
+	"""
+	return apply_schema(read_sql(query, method="copy", name="load_all_data"), "tes", "load_all_data")
+
+
+def iter_tes(start=None, end=None, stations=None, sourceid=None, itersize=ITERSIZE):
+	# Stream tes rows matching the optional filters, ordered by station and time
+	conditions, params = [], []
+	if start is not None:
+		conditions.append("time >= %s")
+		params.append(start)
+	if end is not None:
+		conditions.append("time <= %s")
+		params.append(end)
+	if stations:
+		conditions.append("station = ANY(%s)")
+		params.append(list(stations))
+	if sourceid is not None:
+		conditions.append("sourceid = %s")
+		params.append(sourceid)
+
+	query = f"""
+		SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude
+		FROM tes
+		{"WHERE " + " AND ".join(conditions) if conditions else ""}
+		ORDER BY station, time
+	"""
+	return iter_frames(query, params, itersize=itersize, table="tes", name="iter_tes")
+
+
+def load_df_10():
+	query = """
+		SELECT station, "PM2.5", latitude, longitude, time
+		FROM tes
+		WHERE EXTRACT(HOUR FROM time) = 10
+	"""
+	df_10 = apply_schema(read_sql(query, method="copy", name="load_df_10"), "tes")
+	# Derived from the converted times instead of parsing the raw values twice
+	df_10["date"] = df_10["time"].dt.normalize()
+	return apply_schema(df_10, "tes", "load_df_10")
+
+
+# Dates with fewer usable grid cells than this aren't offered
+MIN_VALID_CELLS = 75
+
+
+def load_df_pm25():
+	# The uploader keeps per-date valid-cell counts in hourly_data_coverage, so
+	# the displayable dates are a lookup rather than a GROUP BY over hourly_data.
+	query = f"""
+		SELECT h.date, h.latitude, h.longitude, h.mean_aod, h.pm25_xgb, h.pm25_rf, h.pm25_lgbm
+		FROM hourly_data h
+		JOIN hourly_data_coverage c ON h.date = c.date
+		WHERE c.n_valid >= {MIN_VALID_CELLS}
+		AND h.latitude IS NOT NULL
+		AND h.longitude IS NOT NULL
+		AND h.pm25_xgb IS NOT NULL
+		AND h.pm25_rf IS NOT NULL
+		AND h.pm25_lgbm IS NOT NULL
+	"""
+	try:
+		df = read_sql(query, method="copy", name="load_df_pm25")
+	except storage.missing_table_errors:
+		# hourly_data_coverage is created by the first `python -m ingest.predictions` run
+		df = read_sql(f"""
+			WITH valid_rows AS (
+				SELECT date, latitude, longitude, mean_aod, pm25_xgb, pm25_rf, pm25_lgbm
+				FROM hourly_data
+				WHERE latitude IS NOT NULL
+				AND longitude IS NOT NULL
+				AND pm25_xgb IS NOT NULL
+				AND pm25_rf IS NOT NULL
+				AND pm25_lgbm IS NOT NULL
+			),
+			filtered_dates AS (
+				SELECT date
+				FROM valid_rows
+				GROUP BY date
+				HAVING COUNT(*) >= {MIN_VALID_CELLS}
+			)
+			SELECT v.*
+			FROM valid_rows v
+			JOIN filtered_dates f ON v.date = f.date
+		""", method="copy", name="load_df_pm25")
+	return apply_schema(df, "hourly_data", "load_df_pm25")
+
+
+def load_grid(date):
+	query = """
+		SELECT latitude, longitude, pm25_xgb, pm25_rf, pm25_lgbm
+		FROM hourly_data
+		WHERE date = %s
+		AND latitude IS NOT NULL
+		AND longitude IS NOT NULL
+	"""
+	return apply_schema(read_sql(query, (date,), name="load_grid"), "hourly_data", "load_grid")
+
+
+def load_grid_cells():
+	query = """
+		SELECT DISTINCT latitude, longitude
+		FROM hourly_data
+		WHERE latitude IS NOT NULL
+		AND longitude IS NOT NULL
+	"""
+	return apply_schema(read_sql(query, name="load_grid_cells"), "hourly_data", "load_grid_cells")
+
+
+def load_data_version():
+	# Newest station reading, newest prediction date and the last prediction
+	# upload. Anything derived from the tables can be cached until one of
+	# these moves.
+	query = """
+		SELECT
+			(SELECT MAX(time) FROM tes) AS tes_time,
+			(SELECT MAX(date) FROM hourly_data) AS grid_date,
+			(SELECT MAX(updated_at) FROM hourly_data_coverage) AS grid_updated
+	"""
+	try:
+		row = read_sql(query, name="load_data_version").iloc[0]
+	except storage.missing_table_errors:
+		# hourly_data_coverage is created by the first `python -m ingest.predictions` run
+		row = read_sql(query.replace("(SELECT MAX(updated_at) FROM hourly_data_coverage)", "NULL"), name="load_data_version").iloc[0]
+	return {"tes_time": row["tes_time"], "grid_date": row["grid_date"], "grid_updated": row["grid_updated"]}
@@ -0,0 +1,80 @@
+# Keeping long time series chart-sized.
+#
+# The history view aggregates in SQL to the finest hour/day/week bucket that
+# keeps a range under MAX_POINTS (pick_bucket). Raw readings, and buckets
+# that still come out too long, are thinned with Largest-Triangle-Three-
+# Buckets, which keeps the peaks and dips a plain stride would drop.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Most points any history chart is given, across all of its series
+MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", 500))
+
+# date_trunc units, finest first
+BUCKETS = {
+	"hour": pd.Timedelta(hours=1),
+	"day": pd.Timedelta(days=1),
+	"week": pd.Timedelta(weeks=1)
+}
+
+
+def pick_bucket(start, end, max_points=MAX_POINTS):
+	# Finest bucket that spans start..end in at most max_points steps
+	span = pd.Timestamp(end) - pd.Timestamp(start)
+	for bucket, width in BUCKETS.items():
+		if span / width <= max_points:
+			return bucket
+	return "week"
+
+
+def lttb_indices(x, y, n):
+	# Positions of the n points LTTB keeps from (x, y); x must be increasing
+	size = len(x)
+	if n >= size:
+		return np.arange(size)
+	if n < 3:
+		return np.linspace(0, size - 1, max(n, 0), dtype=int)
+
+	x = np.asarray(x, dtype=float)
+	y = np.asarray(y, dtype=float)
+	# The first and last points are kept; the rest is split into n - 2 buckets
+	edges = np.linspace(1, size - 1, n - 1).astype(int)
+	kept = np.empty(n, dtype=int)
+	kept[0], kept[-1] = 0, size - 1
+
+	previous = 0
+	for i in range(n - 2):
+		lo, hi = edges[i], edges[i + 1]
+		# Average of the next bucket, or the last point for the final bucket
+		next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else size
+		next_x, next_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+
+		# Twice the triangle area of (previous, candidate, next average)
+		area = np.abs(
+			(x[previous] - next_x) * (y[lo:hi] - y[previous]) -
+			(x[previous] - x[lo:hi]) * (next_y - y[previous])
+		)
+		previous = lo + int(np.argmax(area))
+		kept[i + 1] = previous
+	return kept
+
+
+def downsample(df, x, columns, max_points=MAX_POINTS):
+	# Rows of df, ordered by x, that keep each column's shape within
+	# max_points rows in total. Each column gets an equal share and is thinned
+	# over its own non-missing values; the kept rows are the union.
+	if len(df) <= max_points:
+		return df
+
+	times = df[x].to_numpy().astype("datetime64[ns]").astype(np.int64)
+	share = max_points // len(columns)
+	kept = []
+	for column in columns:
+		values = df[column].to_numpy(dtype=float, na_value=np.nan)
+		valid = np.flatnonzero(~np.isnan(values))
+		kept.append(valid[lttb_indices(times[valid], values[valid], share)])
+	return df.iloc[np.unique(np.concatenate(kept))]
@@ -0,0 +1,94 @@
+# Evaluation of the AOD-derived PM2.5 grid against station readings, shared by
+# the heatmap page and the JSON API.
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+
+def match_predictions(df_10, df_pm25, max_distance=880):
+	# Pair each grid cell with the nearest station reading taken on the same
+	# date within max_distance metres. The grid loader only keeps rows where
+	# every model has a value, so the pairs are the same for all models.
+	# Both loaders already carry `date` as a datetime64 day (see schema.py),
+	# so dates are compared as integers rather than Python date objects.
+	real_df_all = df_10.dropna(subset=["latitude", "longitude", "PM2.5"])
+	aod_df_all = df_pm25.dropna(subset=["latitude", "longitude"])
+
+	# Step 1: Filter to overlapping dates
+	shared_dates = np.intersect1d(real_df_all["date"].unique(), aod_df_all["date"].unique())
+	real_df_all = real_df_all[real_df_all["date"].isin(shared_dates)]
+	aod_df_all = aod_df_all[aod_df_all["date"].isin(shared_dates)]
+
+	if real_df_all.empty or aod_df_all.empty:
+		return pd.DataFrame()
+
+	# Step 2: Convert to GeoDataFrames and reproject to meters
+	gdf_real = gpd.GeoDataFrame(
+		real_df_all,
+		geometry=gpd.points_from_xy(real_df_all["longitude"], real_df_all["latitude"]),
+		crs="EPSG:4326"
+	).to_crs(epsg=3857)
+	gdf_aod = gpd.GeoDataFrame(
+		aod_df_all,
+		geometry=gpd.points_from_xy(aod_df_all["longitude"], aod_df_all["latitude"]),
+		crs="EPSG:4326"
+	).to_crs(epsg=3857)
+
+	# Step 3: Nearest spatial join
+	gdf_matched = gpd.sjoin_nearest(
+		gdf_aod,
+		gdf_real,
+		how='inner',
+		max_distance=max_distance,
+		distance_col="distance_m"
+	)
+
+	# Step 4: Keep matches from the same date
+	gdf_matched = gdf_matched[gdf_matched["date_left"] == gdf_matched["date_right"]]
+	return pd.DataFrame(gdf_matched.drop(columns="geometry"))
+
+
+def model_errors(matched, columns):
+	# Prediction minus observation for every pair, one column per model
+	real = matched["PM2.5"].to_numpy(dtype="float64")
+	return matched[columns].to_numpy(dtype="float64") - real[:, None]
+
+
+def score_models(matched, columns):
+	# MAE, RMSE and R² of every model column in one pass over the pairs
+	real = matched["PM2.5"].to_numpy(dtype="float64")
+	errors = model_errors(matched, columns)
+	sse = (errors ** 2).sum(axis=0)
+	sst = ((real - real.mean()) ** 2).sum()
+	# Constant observations: perfect predictions score 1, anything else 0 (as sklearn's r2_score)
+	r2 = 1 - sse / sst if sst else np.where(sse == 0, 1.0, 0.0)
+
+	return {
+		column: {
+			"mae": float(np.abs(errors[:, i]).mean()),
+			"rmse": float(np.sqrt(sse[i] / len(real))),
+			"r2": float(r2[i]),
+			"n": int(len(real))
+		}
+		for i, column in enumerate(columns)
+	}
+
+
+def score(matched, pm_column):
+	return score_models(matched, [pm_column])[pm_column]
+
+
+def evaluate_models(df_10, df_pm25, columns):
+	# Matched pairs and every model's scores. The heatmap page and the API
+	# keep this in cache.memory under "aod_evaluation".
+	matched = match_predictions(df_10, df_pm25)
+	if matched.empty:
+		return matched, {}
+	return matched, score_models(matched, columns)
+
+
+def error_breakdown(matched, columns, by):
+	# Mean absolute error of every model per value of `by` (station, date, ...)
+	errors = pd.DataFrame(np.abs(model_errors(matched, columns)), columns=columns, index=matched.index)
+	return errors.groupby(matched[by], observed=True).mean()
@@ -0,0 +1,184 @@
+# Prometheus text metrics for a dashboard or API process.
+#
+#   aqi_rerun_seconds{page}                     histogram of rerun latency per
+#                                               page or fragment
+#   aqi_cache_{hits,misses,evictions}_total{loader}
+#   aqi_cache_bytes{loader}, aqi_cache_{used,budget}_bytes
+#   aqi_query_seconds{name,quantile}            rolling query latency, with
+#                                               total _sum and _count
+#   aqi_db_pool_connections{state}              in use / idle / max
+#   aqi_frame_bytes{loader}                     size of the last frame each
+#                                               loader returned
+#   process_resident_memory_bytes
+#
+# start_server() serves them from a daemon thread (METRICS_PORT), so
+# scraping never runs on a Streamlit script thread. Everything except the
+# histogram is read from state the app already keeps, at scrape time.
+
+import logging
+import os
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cache
+import perf
+import schema
+import storage
+import telemetry
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+	# Cumulative bucket counts, sum and count per label value
+
+	def __init__(self, buckets=BUCKETS):
+		self.buckets = buckets
+		self._lock = threading.Lock()
+		self._series = {}
+
+	def observe(self, label, seconds):
+		with self._lock:
+			series = self._series.setdefault(label, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+			for i, bound in enumerate(self.buckets):
+				if seconds <= bound:
+					series["buckets"][i] += 1
+			series["sum"] += seconds
+			series["count"] += 1
+
+	def lines(self, name, label_name):
+		with self._lock:
+			snapshot = {label: dict(series, buckets=list(series["buckets"])) for label, series in self._series.items()}
+
+		yield f"# TYPE {name} histogram"
+		for label, series in sorted(snapshot.items()):
+			labels = f'{label_name}="{escape(label)}"'
+			for bound, count in zip(self.buckets, series["buckets"]):
+				yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+			yield f'{name}_bucket{{{labels},le="+Inf"}} {series["count"]}'
+			yield f"{name}_sum{{{labels}}} {series['sum']}"
+			yield f"{name}_count{{{labels}}} {series['count']}"
+
+
+rerun_seconds = Histogram()
+
+
+def observe_rerun(rerun):
+	rerun_seconds.observe(rerun.page, rerun.total_ms / 1000)
+
+
+# Full reruns are labelled with the page, fragment reruns with the fragment
+perf.listeners.append(observe_rerun)
+
+
+def escape(value):
+	return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def resident_bytes():
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError):
+		# Peak rather than current RSS where /proc isn't available (kB on Linux)
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def cache_lines():
+	summary = cache.memory.summary()
+	for kind in ("hits", "misses", "evictions"):
+		yield f"# TYPE aqi_cache_{kind}_total counter"
+		for loader, stat in sorted(summary["loaders"].items()):
+			yield f'aqi_cache_{kind}_total{{loader="{escape(loader)}"}} {stat[kind]}'
+	yield "# TYPE aqi_cache_bytes gauge"
+	for loader, stat in sorted(summary["loaders"].items()):
+		yield f'aqi_cache_bytes{{loader="{escape(loader)}"}} {stat["bytes"]}'
+	yield "# TYPE aqi_cache_used_bytes gauge"
+	yield f"aqi_cache_used_bytes {summary['used_bytes']}"
+	yield "# TYPE aqi_cache_budget_bytes gauge"
+	yield f"aqi_cache_budget_bytes {summary['budget_bytes']}"
+
+
+def query_lines():
+	summary = telemetry.summary()
+	yield "# TYPE aqi_query_seconds summary"
+	for name, stat in sorted(summary.items()):
+		labels = f'name="{escape(name)}"'
+		for quantile in ("50", "95", "99"):
+			value = stat[f"p{quantile}_ms"]
+			if value is not None:
+				yield f'aqi_query_seconds{{{labels},quantile="0.{quantile}"}} {value / 1000}'
+		yield f"aqi_query_seconds_sum{{{labels}}} {stat['total_ms'] / 1000}"
+		yield f"aqi_query_seconds_count{{{labels}}} {stat['count']}"
+	yield "# TYPE aqi_query_rows_total counter"
+	for name, stat in sorted(summary.items()):
+		yield f'aqi_query_rows_total{{name="{escape(name)}"}} {stat["rows"]}'
+
+
+def frame_lines():
+	yield "# TYPE aqi_frame_bytes gauge"
+	for loader, size in sorted(schema.frame_sizes.items()):
+		yield f'aqi_frame_bytes{{loader="{escape(loader)}"}} {size}'
+
+
+def pool_lines():
+	stats = storage.pool_stats()
+	if stats is None:
+		return
+	yield "# TYPE aqi_db_pool_connections gauge"
+	for state in ("in_use", "idle", "max"):
+		yield f'aqi_db_pool_connections{{state="{state}"}} {stats[state]}'
+
+
+def render():
+	lines = list(rerun_seconds.lines("aqi_rerun_seconds", "page"))
+	lines += cache_lines()
+	lines += query_lines()
+	lines += frame_lines()
+	lines += pool_lines()
+	lines += ["# TYPE process_resident_memory_bytes gauge", f"process_resident_memory_bytes {resident_bytes()}"]
+	return "\n".join(lines) + "\n"
+
+
+class Handler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path.split("?")[0] != "/metrics":
+			self.send_error(404)
+			return
+		body = render().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port=None):
+	# Idempotent: Streamlit runs the script again on every rerun, and only the
+	# first call binds the port
+	global _server
+	port = port or os.environ.get("METRICS_PORT")
+	if not port:
+		return None
+	with _server_lock:
+		if _server is None:
+			try:
+				_server = ThreadingHTTPServer(("0.0.0.0", int(port)), Handler)
+			except OSError as e:
+				logger.warning("metrics server not started on port %s: %s", port, e)
+				_server = False
+				return None
+			threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+			logger.info("Serving metrics on :%s/metrics", port)
+		return _server or None
@@ -0,0 +1,145 @@
+# Timing spans for one rerun of a dashboard page.
+#
+#   perf.start(page)                 at the top of the script
+#   perf.section("monitor.map")      ends the running section and starts the next
+#   with perf.span("st_folium"):     times one block
+#   @perf.timed()                    times every call of a loader
+#   with perf.fragment("monitor.map"):  the body of a st.fragment
+#   perf.finish()                    at the end; returns the rerun's timings
+#
+# Spans are collected on the rerun started in the current context, so loaders
+# run through db.fetch_concurrently still count towards the page that asked
+# for them. Outside a rerun (API, benchmarks) every call is a no-op. With
+# PERF_LOG set, each finished rerun is appended to that file as one JSON line;
+# PERF_DEBUG=1 shows the timings in the dashboard's sidebar.
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+PERF_LOG = os.environ.get("PERF_LOG")
+DEBUG = os.environ.get("PERF_DEBUG") == "1"
+
+_current = contextvars.ContextVar("perf_rerun", default=None)
+_log_lock = threading.Lock()
+
+# Called with every finished Rerun, e.g. by metrics.py
+listeners = []
+
+
+class Rerun:
+	def __init__(self, page):
+		self.page = page
+		self.timestamp = datetime.now()
+		self.started = time.perf_counter()
+		self.total_ms = None
+		self.spans = []
+		self._section = None
+
+	def add(self, name, kind, start, end):
+		self.spans.append({
+			"name": name,
+			"kind": kind,
+			"start_ms": round((start - self.started) * 1000, 1),
+			"ms": round((end - start) * 1000, 1),
+			"thread": threading.current_thread().name
+		})
+
+	def close_section(self, now):
+		if self._section is not None:
+			name, start = self._section
+			self.add(name, "section", start, now)
+			self._section = None
+
+	def to_record(self):
+		return {
+			"time": self.timestamp.isoformat(timespec="milliseconds"),
+			"page": self.page,
+			"total_ms": self.total_ms,
+			"spans": self.spans
+		}
+
+
+def start(page):
+	rerun = Rerun(page)
+	_current.set(rerun)
+	return rerun
+
+
+def current():
+	return _current.get()
+
+
+@contextmanager
+def span(name, kind="block"):
+	rerun = _current.get()
+	if rerun is None:
+		yield
+		return
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		rerun.add(name, kind, start, time.perf_counter())
+
+
+def timed(name=None):
+	def decorator(fn):
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			with span(name or fn.__name__, kind="loader"):
+				return fn(*args, **kwargs)
+		return wrapper
+	return decorator
+
+
+def section(name):
+	# For page code that runs top to bottom, where wrapping each part in a
+	# with-block would re-indent the whole page. section(None) just ends the
+	# running one.
+	rerun = _current.get()
+	if rerun is None:
+		return
+	now = time.perf_counter()
+	rerun.close_section(now)
+	if name is not None:
+		rerun._section = (name, now)
+
+
+@contextmanager
+def fragment(name):
+	# A span during a full rerun; when the fragment reruns on its own, a rerun
+	# of its own named after the fragment
+	if _current.get() is not None:
+		with span(name, kind="fragment"):
+			yield
+		return
+	start(name)
+	try:
+		yield
+	finally:
+		finish()
+
+
+def finish():
+	rerun = _current.get()
+	if rerun is None:
+		return None
+	now = time.perf_counter()
+	rerun.close_section(now)
+	rerun.total_ms = round((now - rerun.started) * 1000, 1)
+	_current.set(None)
+
+	if PERF_LOG:
+		line = json.dumps(rerun.to_record())
+		with _log_lock, open(PERF_LOG, "a") as f:
+			f.write(line + "\n")
+	for listener in listeners:
+		listener(rerun)
+	return rerun
@@ -0,0 +1,161 @@
+# On-demand profiling of a single rerun.
+#
+# Opening any page with ?profile=<PROFILE_TOKEN> runs that rerun under
+# cProfile and tracemalloc, and the page offers the report for download.
+# Nothing is profiled unless PROFILE_TOKEN is set on the server and the
+# query parameter matches it.
+#
+# cProfile only sees the script thread, so loaders fetched concurrently show
+# up as time spent waiting in db.fetch_concurrently; their own timings are in
+# the perf panel. tracemalloc covers every thread.
+#
+# tracemalloc is process-wide, so it is reference counted: it keeps tracing
+# while any profile is running and overlapping profiles never stop each
+# other's tracing. A rerun that raises or calls st.stop()/st.rerun() never
+# reaches stop(); start_if_requested() runs at the top of every rerun and
+# first closes whatever profile a previous run left behind (see
+# abandon_stale), so cProfile and tracemalloc are never left on for good.
+
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+
+# Lines of each section in the text report
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+# Profiles still running after this many seconds are considered abandoned
+MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 300))
+
+_lock = threading.Lock()
+_tracing_users = 0
+_active = {}  # thread ident -> RerunProfiler
+
+
+def _acquire_tracemalloc():
+	global _tracing_users
+	with _lock:
+		if _tracing_users == 0 and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		_tracing_users += 1
+
+
+def _release_tracemalloc():
+	global _tracing_users
+	with _lock:
+		_tracing_users -= 1
+		if _tracing_users == 0 and tracemalloc.is_tracing():
+			tracemalloc.stop()
+
+
+@dataclass
+class ProfileReport:
+	text: str
+	stats: bytes  # marshalled pstats, readable by snakeviz / flameprof / pstats.Stats
+	seconds: float
+	peak_bytes: int
+
+
+class RerunProfiler:
+	# Also a context manager: `with RerunProfiler() as profiler:` stops it on
+	# any exit, and the report is profiler.report afterwards
+
+	def __init__(self):
+		self.profile = cProfile.Profile()
+		self.started = None
+		self.thread = None
+		self.report = None
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
+		return False
+
+	def start(self):
+		_acquire_tracemalloc()
+		tracemalloc.reset_peak()
+		self.thread = threading.get_ident()
+		with _lock:
+			_active[self.thread] = self
+		self.started = time.perf_counter()
+		self.profile.enable()
+		return self
+
+	def _close(self):
+		# Disable profiling and give back tracemalloc; True the first time only
+		with _lock:
+			if _active.get(self.thread) is not self:
+				return False
+			del _active[self.thread]
+		if threading.get_ident() == self.thread:
+			self.profile.disable()
+		_release_tracemalloc()
+		return True
+
+	def stop(self):
+		with _lock:
+			if _active.get(self.thread) is not self:
+				# Never started, already stopped or abandoned
+				return self.report
+		seconds = time.perf_counter() - self.started
+		self.profile.disable()
+		# Taken before releasing tracemalloc, which may stop tracing
+		snapshot = tracemalloc.take_snapshot()
+		_, peak = tracemalloc.get_traced_memory()
+		if not self._close():
+			return None
+
+		stats = pstats.Stats(self.profile)
+		text = io.StringIO()
+		text.write(f"Rerun: {seconds:.3f} s, peak traced memory: {peak / 1e6:.1f} MB\n\n")
+		text.write(f"Top {TOP_FUNCTIONS} functions by cumulative time\n")
+		pstats.Stats(self.profile, stream=text).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+
+		text.write(f"\nTop {TOP_ALLOCATIONS} allocation sites still held at the end of the rerun\n")
+		snapshot = snapshot.filter_traces([
+			tracemalloc.Filter(False, tracemalloc.__file__),
+			tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")
+		])
+		for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+			text.write(f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {stat.traceback}\n")
+
+		self.report = ProfileReport(text.getvalue(), marshal.dumps(stats.stats), seconds, peak)
+		return self.report
+
+
+def abandon_stale():
+	# Close profiles that never reached stop(): the one a previous rerun on
+	# this thread left running, and any whose thread is gone or that have run
+	# longer than MAX_SECONDS
+	alive = {thread.ident for thread in threading.enumerate()}
+	now = time.perf_counter()
+	with _lock:
+		stale = [
+			profiler for ident, profiler in _active.items()
+			if ident == threading.get_ident() or ident not in alive or now - profiler.started > MAX_SECONDS
+		]
+	for profiler in stale:
+		profiler._close()
+
+
+def start_if_requested(token):
+	# A profiler for this rerun when the token matches PROFILE_TOKEN, else None.
+	# Called at the top of every rerun, so it also cleans up abandoned profiles.
+	abandon_stale()
+	if not PROFILE_TOKEN or not token:
+		return None
+	if not hmac.compare_digest(str(token), PROFILE_TOKEN):
+		return None
+	return RerunProfiler().start()
@@ -0,0 +1,79 @@
+# Column dtypes for every frame loaded from the database.
+#
+# pd.read_sql keeps station/sourceid as Python strings repeated on every row
+# and every number as float64. Station and source names become categoricals,
+# measures become float32 and time columns get one datetime dtype, which cuts
+# the full-history and prediction frames to a fraction of their size.
+
+import logging
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMAS = {
+	"tes": {
+		"station": "category",
+		"sourceid": "category",
+		"time": "datetime",
+		"date": "date",
+		"aqi": "float32",
+		"PM2.5": "float32",
+		"latitude": "float32",
+		"longitude": "float32"
+	},
+	"hourly_data": {
+		"date": "date",
+		"latitude": "float32",
+		"longitude": "float32",
+		"mean_aod": "float32",
+		"pm25_xgb": "float32",
+		"pm25_rf": "float32",
+		"pm25_lgbm": "float32"
+	}
+}
+
+# Size in bytes of the last frame returned by each loader
+frame_sizes = {}
+
+
+def frame_bytes(df):
+	return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def to_naive_datetime(series):
+	# read_sql and COPY both hand back timestamptz values with their offset;
+	# keep the wall-clock time the rest of the app compares against
+	if series.dtype == "datetime64[ns]":
+		return series
+	series = pd.to_datetime(series)
+	if series.dt.tz is not None:
+		series = series.dt.tz_localize(None)
+	return series.astype("datetime64[ns]")
+
+
+def apply_schema(df, table, name=None):
+	# Columns that already have their dtype are left alone (date columns after
+	# a check that they hold whole days), so a frame is only converted once
+	# however many times it passes through here
+	for column, dtype in SCHEMAS[table].items():
+		if column not in df.columns:
+			continue
+		if dtype == "category" and isinstance(df[column].dtype, pd.CategoricalDtype):
+			continue
+		if dtype not in ("datetime", "date", "category") and df[column].dtype == dtype:
+			continue
+		if dtype == "date" and df[column].dtype == "datetime64[ns]" and pd.DatetimeIndex(df[column]).is_normalized:
+			continue
+		if dtype == "datetime":
+			df[column] = to_naive_datetime(df[column])
+		elif dtype == "date":
+			df[column] = to_naive_datetime(df[column]).dt.normalize()
+		else:
+			df[column] = df[column].astype(dtype)
+
+	if name is not None:
+		frame_sizes[name] = frame_bytes(df)
+		logger.info("%s: %d rows, %.1f MB", name, len(df), frame_sizes[name] / 1e6)
+	return df
@@ -0,0 +1,230 @@
+# Spatial helpers for estimating PM2.5 at arbitrary coordinates from the
+# ~800 m prediction grid stored in hourly_data.
+
+import io
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+
+# Map the model names shown in the UI to their hourly_data columns
+MODEL_COLUMNS = {
+	"XGBoost": "pm25_xgb",
+	"Random Forest": "pm25_rf",
+	"LightGBM": "pm25_lgbm"
+}
+
+# Local equirectangular projection around Jakarta (~6.2°S). At city scale the
+# error is far below the grid resolution, and it keeps distances in metres.
+LAT0 = -6.2
+M_PER_DEG_LAT = 110574.0
+M_PER_DEG_LON = 111320.0 * np.cos(np.radians(LAT0))
+
+
+def to_xy(lat, lon):
+	lat = np.asarray(lat, dtype="float64")
+	lon = np.asarray(lon, dtype="float64")
+	return np.column_stack([lon * M_PER_DEG_LON, lat * M_PER_DEG_LAT])
+
+
+def idw(dist, idx, values, power=2):
+	# dist/idx come from cKDTree.query with k >= 1; missing neighbours are
+	# reported as dist == inf and idx == len(values)
+	dist = np.atleast_2d(dist)
+	idx = np.atleast_2d(idx)
+
+	padded = np.append(values, np.nan)
+	neighbour_values = padded[idx]
+
+	valid = np.isfinite(dist) & ~np.isnan(neighbour_values)
+	exact = valid & (dist < 1e-6)
+
+	with np.errstate(divide="ignore"):
+		weights = np.where(valid, 1.0 / np.power(dist, power), 0.0)
+	neighbour_values = np.where(valid, neighbour_values, 0.0)
+
+	weight_sum = weights.sum(axis=1)
+	with np.errstate(invalid="ignore", divide="ignore"):
+		estimate = (weights * neighbour_values).sum(axis=1) / weight_sum
+	estimate[weight_sum == 0] = np.nan
+
+	# A point sitting exactly on a grid cell takes that cell's value
+	has_exact = exact.any(axis=1)
+	if has_exact.any():
+		first_exact = exact.argmax(axis=1)
+		rows = np.nonzero(has_exact)[0]
+		estimate[rows] = neighbour_values[rows, first_exact[rows]]
+
+	return estimate
+
+
+class GridIndex:
+	# KD-tree over one day of grid predictions. Build once per date and reuse
+	# it for every lookup on that date.
+
+	def __init__(self, grid_df, columns=None):
+		grid_df = grid_df.dropna(subset=["latitude", "longitude"])
+		if columns is None:
+			columns = [c for c in MODEL_COLUMNS.values() if c in grid_df.columns]
+
+		self.size = len(grid_df)
+		self.tree = cKDTree(to_xy(grid_df["latitude"], grid_df["longitude"])) if self.size else None
+		self.values = {c: grid_df[c].to_numpy(dtype="float64") for c in columns}
+
+	def neighbours(self, lat, lon, k=4, max_distance=1500):
+		# Distances and positions of the k nearest grid cells of each point, as
+		# (points, k) arrays. Missing neighbours have an infinite distance.
+		lat = np.atleast_1d(np.asarray(lat, dtype="float64"))
+		lon = np.atleast_1d(np.asarray(lon, dtype="float64"))
+		k = min(k, self.size)
+		dist, idx = self.tree.query(to_xy(lat, lon), k=k, distance_upper_bound=max_distance)
+		if k == 1:
+			dist, idx = dist[:, None], idx[:, None]
+		return dist, idx
+
+	def estimate_many(self, lat, lon, columns, k=4, power=2, max_distance=1500):
+		# Inverse-distance weighted estimates of several columns from one
+		# neighbour query. Points with no cell within max_distance metres come
+		# back as NaN.
+		if self.tree is None:
+			size = len(np.atleast_1d(lat))
+			return {column: np.full(size, np.nan) for column in columns}
+		dist, idx = self.neighbours(lat, lon, k=k, max_distance=max_distance)
+		return {column: idw(dist, idx, self.values[column], power=power) for column in columns}
+
+	def estimate(self, lat, lon, column, k=4, power=2, max_distance=1500):
+		return self.estimate_many(lat, lon, [column], k=k, power=power, max_distance=max_distance)[column]
+
+	def nearest_distance(self, lat, lon):
+		if self.tree is None:
+			return np.full(len(np.atleast_1d(lat)), np.inf)
+		dist, _ = self.tree.query(to_xy(np.atleast_1d(lat), np.atleast_1d(lon)), k=1)
+		return dist
+
+
+class NeighbourIndex:
+	# Station neighbours precomputed for every grid cell. The station layout
+	# changes far less often than the readings, so this is built once per
+	# layout and every hourly surface is then a couple of array operations.
+
+	def __init__(self, grid_lat, grid_lon, station_lat, station_lon, k=6, length_scale=5000.0, noise=0.1):
+		self.grid_xy = to_xy(grid_lat, grid_lon)
+		self.station_xy = to_xy(station_lat, station_lon)
+		self.length_scale = length_scale
+		self.noise = noise
+		self._gp_weights = None
+
+		k = min(k, len(self.station_xy))
+		dist, idx = cKDTree(self.station_xy).query(self.grid_xy, k=k)
+		if k == 1:
+			dist, idx = dist[:, None], idx[:, None]
+		self.dist, self.idx = dist, idx
+
+	def idw(self, values, power=2):
+		return idw(self.dist, self.idx, np.asarray(values, dtype="float64"), power=power)
+
+	def kriging(self, values):
+		# Simple kriging (Gaussian-process posterior mean) with a squared
+		# exponential covariance around the mean of the station readings
+		values = np.asarray(values, dtype="float64")
+		if self._gp_weights is None:
+			k_ss = np.exp(-0.5 * (cdist(self.station_xy, self.station_xy) / self.length_scale) ** 2)
+			k_gs = np.exp(-0.5 * (cdist(self.grid_xy, self.station_xy) / self.length_scale) ** 2)
+			k_ss[np.diag_indices_from(k_ss)] += self.noise
+			self._gp_weights = np.linalg.solve(k_ss, k_gs.T).T
+
+		mean = np.nanmean(values)
+		residual = np.nan_to_num(values - mean)
+		return mean + self._gp_weights @ residual
+
+
+def latest_station_readings(df, window_hours=3):
+	# Latest reading per station from the last few hours, merged across sources
+	# that report the same location
+	if df.empty:
+		return df[["latitude", "longitude", "PM2.5"]]
+	recent = df[df["time"] >= df["time"].max() - pd.Timedelta(hours=window_hours)]
+	recent = recent.dropna(subset=["latitude", "longitude", "PM2.5"])
+	latest = recent.sort_values("time").groupby("station", as_index=False, observed=True).last()
+	return (
+		latest.groupby([latest["latitude"].round(4), latest["longitude"].round(4)])["PM2.5"]
+		.mean()
+		.reset_index()
+	)
+
+
+def parse_coordinates(text):
+	# Accepts one "lat, lon" pair per line (comma, semicolon or whitespace separated)
+	rows = []
+	for line in text.splitlines():
+		line = line.strip()
+		if not line or line.startswith("#"):
+			continue
+		parts = line.replace(";", ",").replace(",", " ").split()
+		if len(parts) < 2:
+			raise ValueError(f"Could not read a latitude/longitude pair from: {line!r}")
+		rows.append((float(parts[0]), float(parts[1])))
+	return pd.DataFrame(rows, columns=["latitude", "longitude"])
+
+
+LATITUDE_NAMES = ("latitude", "lat", "y")
+LONGITUDE_NAMES = ("longitude", "lon", "lng", "long", "x")
+
+# Columns score_sites adds to every site
+RESERVED_SITE_COLUMNS = ("date", *MODEL_COLUMNS.values())
+
+
+def read_sites(file, name):
+	# Read an uploaded CSV or Parquet list of sites and normalise the
+	# coordinate column names to latitude/longitude
+	if name.lower().endswith(".parquet"):
+		sites = pd.read_parquet(file)
+	else:
+		sites = pd.read_csv(file)
+
+	columns = {c.lower().strip(): c for c in sites.columns}
+	lat_col = next((columns[c] for c in LATITUDE_NAMES if c in columns), None)
+	lon_col = next((columns[c] for c in LONGITUDE_NAMES if c in columns), None)
+	if lat_col is None or lon_col is None:
+		raise ValueError("The file needs latitude and longitude columns.")
+	reserved = [c for c in sites.columns if c in RESERVED_SITE_COLUMNS]
+	if reserved:
+		raise ValueError(f"Rename the {', '.join(reserved)} column(s); the estimates are written under those names.")
+
+	sites = sites.rename(columns={lat_col: "latitude", lon_col: "longitude"})
+	sites["latitude"] = pd.to_numeric(sites["latitude"], errors="coerce")
+	sites["longitude"] = pd.to_numeric(sites["longitude"], errors="coerce")
+	return sites.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+
+
+def score_sites(sites, dates, get_index, columns=None):
+	# Yield one frame per date with every site scored by every model. Only one
+	# day's grid and results are held at a time, so scoring memory is bounded by
+	# the number of sites rather than sites x dates (the CSV that sites_to_csv
+	# builds from the frames is not).
+	if columns is None:
+		columns = list(MODEL_COLUMNS.values())
+
+	xy_lat = sites["latitude"].to_numpy(dtype="float64")
+	xy_lon = sites["longitude"].to_numpy(dtype="float64")
+
+	for date in dates:
+		# One neighbour query per date, shared by every model column
+		estimates = get_index(date).estimate_many(xy_lat, xy_lon, columns)
+		scored = sites.assign(**{column: values.round(2) for column, values in estimates.items()})
+		scored.insert(0, "date", date)
+		yield scored
+
+
+def sites_to_csv(frames):
+	# Serialise the per-date frames one at a time into a single CSV payload.
+	# The payload itself grows with sites x dates; writing each frame straight
+	# into it only avoids holding a second copy of the text while joining.
+	buffer = io.BytesIO()
+	header = True
+	for frame in frames:
+		buffer.write(frame.to_csv(index=False, header=header).encode("utf-8"))
+		header = False
+	return buffer.getvalue()
@@ -0,0 +1,136 @@
+# Station and time-range slicing without scanning the whole frame.
+#
+# A StationIndex records where each station's readings sit once the frame is
+# ordered by (station, time): one [start, stop) block per station, so a
+# station is a positional slice and a time range inside it is a binary search
+# over that block. tes loaders already return rows in that order, in which
+# case slices come back as iloc views of the frame rather than boolean-mask
+# copies.
+#
+# The index holds row positions and times only, never the frame itself, and
+# every lookup takes the frame it was built from. index_for(df) builds it once
+# per frame object and drops it when the frame is garbage collected, so an
+# index never keeps an evicted cache entry alive.
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+def station_codes(series):
+	# Integer code per row and the station name for each code, in code order
+	if isinstance(series.dtype, pd.CategoricalDtype):
+		return series.cat.codes.to_numpy(), series.cat.categories
+	codes, stations = pd.factorize(series, sort=True)
+	return codes, stations
+
+
+def is_sorted(codes, times):
+	if len(codes) < 2:
+		return True
+	code_step = np.diff(codes)
+	return bool(np.all((code_step > 0) | ((code_step == 0) & (times[1:] >= times[:-1]))))
+
+
+class StationIndex:
+	def __init__(self, df):
+		codes, stations = station_codes(df["station"])
+		times = df["time"].to_numpy()
+		# Positions of the rows in (station, time) order, or None when the
+		# frame is already in that order
+		self.order = None
+		if not is_sorted(codes, times):
+			self.order = np.lexsort((times, codes))
+			codes, times = codes[self.order], times[self.order]
+
+		self.times = times
+
+		# Rows with a missing station (code -1) sort first and belong to no block
+		bounds = np.searchsorted(codes, np.arange(len(stations) + 1))
+		self.blocks = {
+			station: (int(bounds[i]), int(bounds[i + 1]))
+			for i, station in enumerate(stations)
+			if bounds[i] < bounds[i + 1]
+		}
+
+		self.stations_by_source = {}
+		if "sourceid" in df.columns:
+			pairs = df[["sourceid", "station"]].drop_duplicates()
+			for source, station in zip(pairs["sourceid"], pairs["station"]):
+				self.stations_by_source.setdefault(source, []).append(station)
+			for stations_list in self.stations_by_source.values():
+				stations_list.sort()
+
+	@property
+	def stations(self):
+		return list(self.blocks)
+
+	def bounds(self, station, start=None, end=None):
+		# [start, stop) sorted positions of the station's readings with start <= time <= end
+		if station not in self.blocks:
+			return 0, 0
+		lo, hi = self.blocks[station]
+		block = self.times[lo:hi]
+		if start is not None:
+			lo += int(np.searchsorted(block, pd.Timestamp(start).to_datetime64(), side="left"))
+		if end is not None:
+			hi = self.blocks[station][0] + int(np.searchsorted(block, pd.Timestamp(end).to_datetime64(), side="right"))
+		return lo, max(lo, hi)
+
+	def _rows(self, df, lo, hi):
+		# Sorted positions [lo, hi) of df: a view when df is already in order
+		if self.order is None:
+			return df.iloc[lo:hi]
+		return df.take(self.order[lo:hi])
+
+	def station(self, df, station, start=None, end=None):
+		lo, hi = self.bounds(station, start, end)
+		return self._rows(df, lo, hi)
+
+	def select(self, df, stations=None, start=None, end=None):
+		# Rows of the given stations (all if None) within the time range. A
+		# single block is a view; several are concatenated into the result only.
+		if stations is None and start is None and end is None:
+			return df
+		if stations is None:
+			# Every block is touched anyway, and one mask over the sorted times
+			# beats concatenating hundreds of per-station ranges
+			mask = np.ones(len(self.times), dtype=bool)
+			if start is not None:
+				mask &= self.times >= pd.Timestamp(start).to_datetime64()
+			if end is not None:
+				mask &= self.times <= pd.Timestamp(end).to_datetime64()
+			return df[mask] if self.order is None else df.take(self.order[mask])
+		ranges = [r for r in (self.bounds(s, start, end) for s in stations) if r[1] > r[0]]
+		if not ranges:
+			return df.iloc[0:0]
+		if len(ranges) == 1:
+			return self._rows(df, *ranges[0])
+		lo, hi = np.array(ranges).T
+		lengths = hi - lo
+		# Positions of every selected row, built without a Python loop per row
+		positions = np.arange(lengths.sum()) + np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+		return df.take(positions if self.order is None else self.order[positions])
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def index_for(df):
+	# The StationIndex of this frame object, built on first use and dropped
+	# when the frame is garbage collected. Lookups still take the frame:
+	#   index_for(df).station(df, "Station A")
+	key = id(df)
+	with _lock:
+		entry = _indexes.get(key)
+		if entry is not None and entry[0]() is df:
+			return entry[1]
+
+	index = StationIndex(df)
+	with _lock:
+		_indexes[key] = (weakref.ref(df), index)
+	weakref.finalize(df, _indexes.pop, key, None)
+	return index
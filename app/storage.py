@@ -0,0 +1,303 @@
+# Storage engines the loaders in db.py run their SQL on.
+#
+#   STORAGE_BACKEND=postgres  the tes / hourly_data tables in Postgres (default)
+#   STORAGE_BACKEND=duckdb    Parquet files in DATA_DIR, queried in-process by
+#                             DuckDB (needs the optional `duckdb` package), so
+#                             the dashboard and API run without a database
+#                             server
+#
+# Both engines take the same queries with %s placeholders and return
+# DataFrames; db.py applies the column schema on top. DATA_DIR holds one
+# <table>.parquet file or a <table>/ directory of Parquet files per table, as
+# written by `python app/storage.py export DIR` or bench/synth.py.
+
+import argparse
+import glob
+import io
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+
+TABLES = ["tes", "hourly_data", "hourly_data_coverage"]
+
+# Rows fetched per round trip when streaming a result in chunks
+ITERSIZE = int(os.environ.get("DB_ITERSIZE", 50000))
+
+
+def connection_params():
+	return {
+		"host": os.environ.get("DB_HOST"),
+		"port": os.environ.get("DB_PORT"),
+		"dbname": os.environ.get("DB_NAME"),
+		"user": os.environ.get("DB_USER"),
+		"password": os.environ.get("DB_PASS")
+	}
+
+
+# Connections are reused across reruns and sessions instead of opening one
+# per query. Sized so a page can run its queries side by side.
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", 8))
+# Seconds a query waits for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# ThreadedConnectionPool raises as soon as every connection is taken. Sessions,
+# streamed exports and API threads all borrow connections outside the loader
+# executor, so callers queue here for a slot instead.
+_slots = threading.BoundedSemaphore(POOL_MAX)
+
+# Connections lent out by pooled_connection() and those open in the pool,
+# counted here for pool_stats() instead of reading the pool's private state
+_in_use = 0
+_open = set()
+_stats_lock = threading.Lock()
+
+
+def get_pool():
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			_pool = ThreadedConnectionPool(1, POOL_MAX, **connection_params())
+		return _pool
+
+
+@contextmanager
+def pooled_connection():
+	global _in_use
+	if not _slots.acquire(timeout=POOL_TIMEOUT):
+		raise PoolError(f"no database connection free within {POOL_TIMEOUT:g} s (DB_POOL_MAX={POOL_MAX})")
+	try:
+		pool = get_pool()
+		conn = pool.getconn()
+		if conn.closed:
+			pool.putconn(conn, close=True)
+			with _stats_lock:
+				_open.discard(conn)
+			conn = pool.getconn()
+		conn.autocommit = True
+		with _stats_lock:
+			_in_use += 1
+			_open.add(conn)
+
+		broken = False
+		try:
+			yield conn
+		except (psycopg2.OperationalError, psycopg2.InterfaceError):
+			broken = True
+			raise
+		finally:
+			pool.putconn(conn, close=broken or bool(conn.closed))
+			with _stats_lock:
+				_in_use -= 1
+				# The pool closes connections it doesn't keep idle
+				if conn.closed:
+					_open.discard(conn)
+	finally:
+		_slots.release()
+
+
+def pool_stats():
+	# Connection counts of the pool, or None before the first query creates it
+	if _pool is None:
+		return None
+	with _stats_lock:
+		open_count = sum(1 for conn in _open if not conn.closed)
+		return {"in_use": _in_use, "idle": max(open_count - _in_use, 0), "max": POOL_MAX}
+
+
+def _read_sql(conn, query, params):
+	return pd.read_sql(query, conn, params=params)
+
+
+def _read_copy(conn, query, params):
+	buffer = io.BytesIO()
+	with conn.cursor() as cur:
+		# COPY takes no bind parameters, so inline them safely first
+		sql = cur.mogrify(query, params).decode("utf-8")
+		cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+		cur.execute("SHOW TIME ZONE")
+		session_tz = cur.fetchone()[0]
+	buffer.seek(0)
+	df = pd.read_csv(buffer, engine="pyarrow")
+
+	# pyarrow turns timestamptz text into UTC; shift it back to the session's
+	# zone so the wall-clock times match what read_sql returns
+	for column in df.columns:
+		if isinstance(df[column].dtype, pd.DatetimeTZDtype):
+			try:
+				df[column] = df[column].dt.tz_convert(session_tz)
+			except (KeyError, ValueError):
+				# Not an IANA zone name pandas understands; leave it in UTC
+				pass
+	return df
+
+
+class PostgresStorage:
+	# How results are read:
+	#   "sql"   pd.read_sql, which builds a Python tuple per row first
+	#   "copy"  COPY (query) TO STDOUT as CSV, parsed straight into columns by
+	#           pyarrow; much faster for large scans
+	# DB_READ_METHOD overrides the per-loader choice everywhere.
+	readers = {
+		"sql": _read_sql,
+		"copy": _read_copy
+	}
+
+	# Raised when a query names a table that doesn't exist (yet)
+	missing_table_errors = (pd.errors.DatabaseError, psycopg2.ProgrammingError)
+
+	def __init__(self, read_method=None):
+		self.read_method = read_method
+
+	def read(self, query, params=None, method="sql"):
+		reader = self.readers[self.read_method or method]
+		try:
+			with pooled_connection() as conn:
+				return reader(conn, query, params)
+		except (psycopg2.OperationalError, psycopg2.InterfaceError):
+			# A pooled connection may have been dropped by the server; retry once on a fresh one
+			with pooled_connection() as conn:
+				return reader(conn, query, params)
+
+	def explain(self, query, params=None):
+		with pooled_connection() as conn, conn.cursor() as cur:
+			cur.execute("EXPLAIN " + query, params)
+			return "\n".join(row[0] for row in cur.fetchall())
+
+	def iter_frames(self, query, params=None, itersize=ITERSIZE):
+		# Yield the result in DataFrame chunks from a named (server-side) cursor,
+		# so peak memory is bounded by itersize rather than by the table size.
+		# The pooled connection is held until the generator is exhausted or closed.
+		with pooled_connection() as conn:
+			# Named cursors only live inside a transaction
+			conn.autocommit = False
+			try:
+				with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+					cur.itersize = itersize
+					cur.execute(query, params)
+					while True:
+						rows = cur.fetchmany(itersize)
+						if not rows:
+							break
+						yield pd.DataFrame.from_records(rows, columns=[d.name for d in cur.description])
+			finally:
+				if not conn.closed:
+					conn.rollback()
+					conn.autocommit = True
+
+
+def parquet_source(data_dir, table):
+	# Path or glob DuckDB should scan for a table, or None if it has no files
+	directory = os.path.join(data_dir, table)
+	if os.path.isdir(directory) and glob.glob(os.path.join(directory, "*.parquet")):
+		return os.path.join(directory, "*.parquet")
+	path = os.path.join(data_dir, f"{table}.parquet")
+	if os.path.exists(path):
+		return path
+	return None
+
+
+class DuckDBStorage:
+	# Views over the Parquet files in data_dir, queried with DuckDB's vectorised
+	# engine and handed over through Arrow. Each query runs on its own cursor,
+	# so loaders can still be fetched concurrently.
+
+	def __init__(self, data_dir):
+		try:
+			import duckdb
+		except ImportError:
+			raise RuntimeError("STORAGE_BACKEND=duckdb needs the `duckdb` package (pip install duckdb)")
+
+		self.data_dir = data_dir
+		self.missing_table_errors = (duckdb.CatalogException,)
+		self.conn = duckdb.connect()
+		for table in TABLES:
+			source = parquet_source(data_dir, table)
+			if source is not None:
+				escaped = source.replace("'", "''")
+				self.conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{escaped}')")
+
+		if parquet_source(data_dir, "tes") is None:
+			raise RuntimeError(f"No tes data in {data_dir} (expected tes.parquet or tes/*.parquet)")
+
+	def execute(self, query, params):
+		cur = self.conn.cursor()
+		# Same queries as Postgres; only the placeholder style differs
+		return cur.execute(query.replace("%s", "?"), list(params) if params else None)
+
+	def read(self, query, params=None, method="sql"):
+		return self.execute(query, params).df()
+
+	def explain(self, query, params=None):
+		# Rows of (explain_key, explain_value); the value is the rendered plan
+		return "\n".join(row[-1] for row in self.execute("EXPLAIN " + query, params).fetchall())
+
+	def iter_frames(self, query, params=None, itersize=ITERSIZE):
+		for batch in self.execute(query, params).fetch_record_batch(itersize):
+			yield batch.to_pandas()
+
+
+def create_storage():
+	kind = os.environ.get("STORAGE_BACKEND", "postgres").lower()
+	if kind == "postgres":
+		return PostgresStorage(os.environ.get("DB_READ_METHOD"))
+	if kind == "duckdb":
+		return DuckDBStorage(os.environ.get("DATA_DIR", "data"))
+	raise ValueError(f"Unknown STORAGE_BACKEND: {kind}")
+
+
+def export(data_dir, tables=TABLES, itersize=ITERSIZE):
+	# Copy the Postgres tables into DATA_DIR for STORAGE_BACKEND=duckdb,
+	# streaming each one so the export never holds a whole table in memory
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+
+	source = PostgresStorage()
+	os.makedirs(data_dir, exist_ok=True)
+	for table in tables:
+		path = os.path.join(data_dir, f"{table}.parquet")
+		tmp = f"{path}.tmp"
+		writer = None
+		rows = 0
+		try:
+			for frame in source.iter_frames(f"SELECT * FROM {table}", itersize=itersize):
+				batch = pa.Table.from_pandas(frame, preserve_index=False)
+				if writer is None:
+					writer = pq.ParquetWriter(tmp, batch.schema)
+				writer.write_table(batch.cast(writer.schema))
+				rows += len(frame)
+		except psycopg2.ProgrammingError:
+			print(f"{table}: not found, skipped")
+			continue
+		finally:
+			if writer is not None:
+				writer.close()
+		if writer is None:
+			print(f"{table}: empty, skipped")
+			continue
+		os.replace(tmp, path)
+		print(f"{table}: {rows:,} rows -> {path}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Storage utilities")
+	commands = parser.add_subparsers(dest="command", required=True)
+	export_parser = commands.add_parser("export", help="copy the Postgres tables to Parquet for STORAGE_BACKEND=duckdb")
+	export_parser.add_argument("data_dir")
+	export_parser.add_argument("--table", action="append", choices=TABLES, help="only export this table (repeatable)")
+	args = parser.parse_args()
+
+	if args.command == "export":
+		export(args.data_dir, args.table or TABLES)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,36 @@
+# Incremental consumers for the DataFrame chunks yielded by db.iter_frames().
+# Each keeps only its running state, so a full-history scan never has to be
+# materialised at once.
+
+import pandas as pd
+
+
+def csv_chunks(frames):
+	# CSV text per chunk, with the header only on the first one. Closing this
+	# generator closes `frames` too, releasing whatever cursor feeds it.
+	header = True
+	try:
+		for frame in frames:
+			yield frame.to_csv(index=False, header=header).encode("utf-8")
+			header = False
+		if header:
+			yield b""
+	finally:
+		if hasattr(frames, "close"):
+			frames.close()
+
+
+def daily_means(frames, columns=("aqi", "PM2.5")):
+	# Daily mean per station, accumulated as sums and counts chunk by chunk
+	columns = list(columns)
+	sums, counts = None, None
+	for frame in frames:
+		keys = [frame["station"].astype(str), frame["time"].dt.normalize().rename("date")]
+		grouped = frame[columns].groupby(keys)
+		chunk_sums, chunk_counts = grouped.sum(), grouped.count()
+		sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+		counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+
+	if sums is None:
+		return pd.DataFrame(columns=["station", "date"] + columns)
+	return (sums / counts).reset_index()
@@ -0,0 +1,107 @@
+# Telemetry for every query db.py runs.
+#
+# Each query is logged (logger "telemetry") with its normalised SQL,
+# parameters, duration, row count and approximate size. Durations are kept in
+# a rolling window per query name for p50/p95/p99, and any query slower than
+# SLOW_QUERY_MS is written with its EXPLAIN plan to SLOW_QUERY_LOG (JSON
+# lines), or to the log when that isn't set.
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+
+logger = logging.getLogger("telemetry")
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 1000))
+SLOW_QUERY_LOG = os.environ.get("SLOW_QUERY_LOG")
+
+# Durations kept per query name for the percentiles
+WINDOW = int(os.environ.get("QUERY_STATS_WINDOW", 500))
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def normalize_sql(query):
+	return re.sub(r"\s+", " ", query).strip()
+
+
+def format_params(params, limit=200):
+	text = repr(params)
+	return text if len(text) <= limit else text[:limit] + "..."
+
+
+def approximate_bytes(df):
+	# Shallow size: cheap enough to take on every query
+	return int(df.memory_usage(index=False, deep=False).sum())
+
+
+def _stat(name):
+	return _stats.setdefault(name, {"durations": deque(maxlen=WINDOW), "count": 0, "total_ms": 0.0, "rows": 0, "bytes": 0, "slow": 0})
+
+
+def record(name, query, params, seconds, rows, nbytes, explain=None):
+	# explain() is only called for slow queries and returns the plan as text
+	ms = seconds * 1000
+	sql = normalize_sql(query)
+	slow = ms >= SLOW_QUERY_MS
+
+	with _lock:
+		stat = _stat(name)
+		stat["durations"].append(ms)
+		stat["count"] += 1
+		stat["total_ms"] += ms
+		stat["rows"] += rows
+		stat["bytes"] += nbytes
+		stat["slow"] += int(slow)
+
+	entry = {
+		"time": datetime.now().isoformat(timespec="milliseconds"),
+		"name": name,
+		"sql": sql,
+		"params": format_params(params),
+		"ms": round(ms, 1),
+		"rows": rows,
+		"bytes": nbytes
+	}
+	logger.info(json.dumps(entry))
+
+	if slow:
+		try:
+			entry["plan"] = explain() if explain is not None else None
+		except Exception as e:
+			entry["plan"] = f"EXPLAIN failed: {e!r}"
+		if SLOW_QUERY_LOG:
+			with _lock, open(SLOW_QUERY_LOG, "a") as f:
+				f.write(json.dumps(entry) + "\n")
+		else:
+			logger.warning("slow query %s (%.0f ms)\n%s\n%s", name, ms, sql, entry["plan"])
+
+
+def summary():
+	# Per query name: calls, total and rolling p50/p95/p99 time in ms, total
+	# rows and bytes
+	with _lock:
+		items = {name: (list(stat["durations"]), dict(stat)) for name, stat in _stats.items()}
+
+	result = {}
+	for name, (durations, stat) in items.items():
+		p50, p95, p99 = [float(v) for v in np.percentile(durations, [50, 95, 99])] if durations else (None, None, None)
+		result[name] = {
+			"count": stat["count"],
+			"total_ms": stat["total_ms"],
+			"slow": stat["slow"],
+			"rows": stat["rows"],
+			"bytes": stat["bytes"],
+			"p50_ms": p50,
+			"p95_ms": p95,
+			"p99_ms": p99
+		}
+	return result
@@ -0,0 +1,39 @@
+# Frame transformations behind the dashboard pages. They take loader output
+# and return what a widget draws, without touching Streamlit, so the same code
+# runs in the app and in bench/run.py.
+
+import pandas as pd
+
+
+def latest_per_station(df_today):
+	# Latest reading per station from today's data only
+	return df_today.sort_values("time").groupby("station", as_index=False, observed=True).last()
+
+
+def weekly_daily_means(weekly_df):
+	# Daily average PM2.5 and AQI of one station's readings, melted for the dual bar chart
+	daily_avg = weekly_df.groupby(weekly_df["time"].dt.normalize().rename("date"))[["aqi", "PM2.5"]].mean().reset_index()
+	daily_avg = daily_avg.rename(columns={"PM2.5": "PM2_5"})
+	daily_avg = daily_avg[
+		daily_avg["aqi"].notna() & (daily_avg["aqi"] != 0) &
+		daily_avg["PM2_5"].notna() & (daily_avg["PM2_5"] != 0)
+	]
+	daily_avg = daily_avg.assign(weekday=daily_avg["date"].dt.strftime("%a"))  # e.g., Mon, Tue
+
+	return daily_avg[["weekday", "PM2_5", "aqi"]].melt(id_vars="weekday", var_name="Metric", value_name="Value")
+
+
+def station_leaderboard(df_today, n=5):
+	# Stations with the highest and lowest average AQI today
+	df_today_avg = df_today.groupby("station", observed=True)[["aqi", "PM2.5"]].mean().reset_index()
+	df_today_avg = df_today_avg.rename(columns={"PM2.5": "pm25"})
+
+	top = df_today_avg.sort_values("aqi", ascending=False).head(n)
+	low = df_today_avg.sort_values("aqi", ascending=True).head(n)
+	return top, low
+
+
+def heatmap_points(df_pm25, date, pm_column):
+	# Grid cells with a prediction on one date
+	selected_df = df_pm25[df_pm25["date"] == pd.Timestamp(date)]
+	return selected_df.dropna(subset=["latitude", "longitude", pm_column])
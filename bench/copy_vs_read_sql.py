@@ -0,0 +1,80 @@
+# Compare the two db.py read paths on a synthetic tes-shaped table.
+#
+#   DB_HOST=... DB_NAME=... python bench/copy_vs_read_sql.py --rows 1000000
+#
+# Creates an UNLOGGED scratch table (dropped afterwards unless --keep), reads it
+# back with pd.read_sql and with COPY ... TO STDOUT, and prints time and
+# throughput for each.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import db  # noqa: E402
+
+
+TABLE = "bench_copy_tes"
+
+
+def create_table(rows):
+	with db.pooled_connection() as conn, conn.cursor() as cur:
+		cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+		cur.execute(f"""
+			CREATE UNLOGGED TABLE {TABLE} AS
+			SELECT
+				'Station ' || (g % 60) AS station,
+				(ARRAY['iqair', 'rendahemisi', 'klhk', 'udarajakarta'])[(g % 4) + 1] AS sourceid,
+				TIMESTAMP '2024-01-01' + (g || ' minutes')::interval AS time,
+				(random() * 200)::real AS aqi,
+				(random() * 80)::real AS "PM2.5",
+				(-6.4 + random() * 0.4)::double precision AS latitude,
+				(106.6 + random() * 0.4)::double precision AS longitude
+			FROM generate_series(1, %s) AS g
+		""", (rows,))
+
+
+def drop_table():
+	with db.pooled_connection() as conn, conn.cursor() as cur:
+		cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def time_method(method, repeat):
+	query = f'SELECT station, sourceid, time, aqi, "PM2.5", latitude, longitude FROM {TABLE}'
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		df = db.read_sql(query, method=method)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best, len(df)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Compare read_sql and COPY read paths")
+	parser.add_argument("--rows", type=int, default=1_000_000)
+	parser.add_argument("--repeat", type=int, default=3)
+	parser.add_argument("--keep", action="store_true", help="keep the scratch table for further runs")
+	parser.add_argument("--reuse", action="store_true", help="reuse an existing scratch table")
+	args = parser.parse_args()
+
+	if not args.reuse:
+		print(f"Creating {TABLE} with {args.rows:,} rows...")
+		create_table(args.rows)
+
+	try:
+		results = {method: time_method(method, args.repeat) for method in ("sql", "copy")}
+	finally:
+		if not args.keep:
+			drop_table()
+
+	print(f"{'method':<8}{'rows':>12}{'best (s)':>12}{'rows/s':>14}")
+	for method, (elapsed, rows) in results.items():
+		print(f"{method:<8}{rows:>12,}{elapsed:>12.2f}{rows / elapsed:>14,.0f}")
+	print(f"copy speed-up: {results['sql'][0] / results['copy'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,239 @@
+# Benchmark the dashboard's data path on seeded synthetic data.
+#
+#   python bench/run.py                                  # default size, writes bench/results/latest.json
+#   python bench/run.py --stations 200 --days 30 --grid 80 --out big.json
+#   python bench/run.py --baseline bench/results/baseline.json --threshold 0.2
+#   DB_HOST=... python bench/run.py --loaders            # also time db.py loaders
+#   python bench/run.py --memory                         # also trace memory per page rerun
+#
+# Every page transformation runs on the same frames the loaders would return
+# (synthetic rows passed through apply_schema). Each case reports the best and
+# median of --repeat runs; with --baseline, cases whose median got slower by
+# more than --threshold are listed and the exit status is 1.
+#
+# --memory replays each page's per-rerun data path once under tracemalloc and
+# reports the peak memory it allocated on top of the loaded frames, and what
+# it still holds afterwards.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from downsample import downsample  # noqa: E402
+from evaluation import error_breakdown, match_predictions, score, score_models  # noqa: E402
+from schema import apply_schema  # noqa: E402
+from spatial import MODEL_COLUMNS  # noqa: E402
+from synth import make_dataset  # noqa: E402
+from station_index import StationIndex, index_for  # noqa: E402
+from transform import heatmap_points, latest_per_station, station_leaderboard, weekly_daily_means  # noqa: E402
+
+
+# Differences below this are timer noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.002
+
+
+def time_case(fn, repeat):
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = fn()
+		timings.append(time.perf_counter() - start)
+	rows = len(result) if hasattr(result, "__len__") else None
+	return {"best_s": min(timings), "median_s": statistics.median(timings), "rows": rows}
+
+
+def transform_cases(dataset, end):
+	tes = apply_schema(dataset["tes"].copy(), "tes")
+	hourly = apply_schema(dataset["hourly_data"].copy(), "hourly_data")
+
+	today = end.normalize()
+	df_today = tes[tes["time"] >= today]
+	df_week = tes[tes["time"] >= today - timedelta(days=today.weekday())]
+	station = df_today["station"].iloc[0]
+	week_index = StationIndex(df_week)
+	tes_index = StationIndex(tes)
+	range_start, range_end = today - timedelta(days=3), today
+	last_date = hourly["date"].max().date()
+	# Every reading in time order stands in for a long raw station history
+	history = tes.sort_values("time", kind="stable")
+
+	df_10 = tes[tes["time"].dt.hour == 10][["station", "PM2.5", "latitude", "longitude", "time"]]
+	df_10 = df_10.assign(date=df_10["time"].dt.normalize())
+	matched = match_predictions(df_10, hourly)
+
+	return {
+		"apply_schema.tes": lambda: apply_schema(dataset["tes"].copy(), "tes"),
+		"apply_schema.hourly_data": lambda: apply_schema(dataset["hourly_data"].copy(), "hourly_data"),
+		"monitor.latest_per_station": lambda: latest_per_station(df_today),
+		"monitor.station_mask": lambda: df_week[df_week["station"] == station],
+		"monitor.station_index_build": lambda: StationIndex(df_week).blocks,
+		"monitor.station_index_slice": lambda: week_index.station(df_week, station),
+		"monitor.weekly_daily_means": lambda: weekly_daily_means(week_index.station(df_week, station)),
+		"monitor.history_lttb": lambda: downsample(history, "time", ["aqi", "PM2.5"]),
+		"download.range_mask": lambda: tes[(tes["time"] >= range_start) & (tes["time"] <= range_end)],
+		"download.range_index": lambda: tes_index.select(tes, start=range_start, end=range_end),
+		"monitor.station_leaderboard": lambda: station_leaderboard(df_today)[0],
+		"aod.heatmap_points": lambda: heatmap_points(hourly, last_date, "pm25_xgb"),
+		"aod.match_predictions": lambda: match_predictions(df_10, hourly),
+		"aod.score_all_models": lambda: [score(matched, column) for column in MODEL_COLUMNS.values()],
+		"aod.score_models": lambda: score_models(matched, list(MODEL_COLUMNS.values())),
+		"aod.error_breakdown": lambda: [error_breakdown(matched, list(MODEL_COLUMNS.values()), by) for by in ("station", "date_left")]
+	}
+
+
+def memory_case(fn):
+	gc.collect()
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	result = fn()
+	after, peak = tracemalloc.get_traced_memory()
+	blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+	tracemalloc.stop()
+	del result
+	return {"peak_bytes": peak - before, "retained_bytes": after - before, "retained_blocks": blocks}
+
+
+def page_runs(dataset, end):
+	# What one rerun of each page does with the (cached) loader frames
+	tes = apply_schema(dataset["tes"].copy(), "tes")
+	hourly = apply_schema(dataset["hourly_data"].copy(), "hourly_data")
+
+	today = end.normalize()
+	df_today = tes[tes["time"] >= today]
+	df_week = tes[tes["time"] >= today - timedelta(days=today.weekday())]
+	station = df_today["station"].iloc[0]
+	range_start, range_end = today - timedelta(days=3), today
+
+	df_10 = tes[tes["time"].dt.hour == 10][["station", "PM2.5", "latitude", "longitude", "time"]]
+	df_10 = df_10.assign(date=df_10["time"].dt.normalize())
+
+	def monitor():
+		latest = latest_per_station(df_today)
+		station_df = index_for(df_today).station(df_today, station)
+		weekly = weekly_daily_means(index_for(df_week).station(df_week, station))
+		top, low = station_leaderboard(df_today)
+		return latest, station_df, weekly, top, low
+
+	def download():
+		filtered = index_for(tes).select(tes, None, range_start, range_end)
+		return filtered, filtered.iloc[:1000]
+
+	def aod():
+		dates = sorted(hourly["date"].drop_duplicates().dt.date, reverse=True)
+		points = heatmap_points(hourly, dates[0], "pm25_xgb")
+		matched = match_predictions(df_10, hourly)
+		return points, score_models(matched, list(MODEL_COLUMNS.values()))
+
+	# Indexes are built once per cached frame, not per rerun
+	for df in (df_today, df_week, tes):
+		index_for(df)
+	return {"monitor": monitor, "download": download, "aod": aod}
+
+
+def loader_cases(end):
+	import db
+
+	today = end.strftime("%Y-%m-%d")
+	start_of_week = (end - timedelta(days=end.weekday())).strftime("%Y-%m-%d 00:00:00")
+	end_of_week = end.strftime("%Y-%m-%d 23:59:59")
+	return {
+		"db.load_data": lambda: db.load_data(today),
+		"db.load_weekly_data": lambda: db.load_weekly_data(start_of_week, end_of_week),
+		"db.load_df_10": db.load_df_10,
+		"db.load_df_pm25": db.load_df_pm25,
+		"db.load_all_data": db.load_all_data
+	}
+
+
+def compare(results, baseline, threshold):
+	regressions = []
+	for name, result in results.items():
+		before = baseline.get("results", {}).get(name)
+		if before is None:
+			continue
+		ratio = result["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+		result["baseline_median_s"] = before["median_s"]
+		result["ratio"] = ratio
+		if ratio > 1 + threshold and result["median_s"] - before["median_s"] > MIN_REGRESSION_SECONDS:
+			regressions.append(name)
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Time loaders and page transformations on synthetic data")
+	parser.add_argument("--stations", type=int, default=60)
+	parser.add_argument("--sources", type=int, default=4)
+	parser.add_argument("--days", type=int, default=7)
+	parser.add_argument("--grid", type=int, default=40, help="prediction grid is GRID x GRID cells")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--end", help="last hour of data, e.g. 2024-06-30T23:00 (default: now); fix it to compare runs on identical data")
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--loaders", action="store_true", help="also time db.py loaders against DB_HOST")
+	parser.add_argument("--memory", action="store_true", help="also trace peak memory of each page's rerun")
+	parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "results", "latest.json"))
+	parser.add_argument("--baseline", help="earlier results file to compare against")
+	parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, e.g. 0.2 = 20%%")
+	args = parser.parse_args()
+
+	end = pd.Timestamp(args.end or datetime.now()).floor("h")
+	dataset = make_dataset(args.stations, args.sources, args.days, args.grid, end, args.seed)
+
+	cases = transform_cases(dataset, end)
+	if args.loaders:
+		cases.update(loader_cases(end))
+
+	results = {}
+	for name, fn in cases.items():
+		results[name] = time_case(fn, args.repeat)
+		print(f"{name:<32}{results[name]['median_s'] * 1000:>10.1f} ms")
+
+	memory = {}
+	if args.memory:
+		for page, fn in page_runs(dataset, end).items():
+			memory[page] = memory_case(fn)
+			print(
+				f"memory.{page:<25}{memory[page]['peak_bytes'] / 1e6:>10.1f} MB peak"
+				f"{memory[page]['retained_bytes'] / 1e6:>10.1f} MB retained{memory[page]['retained_blocks']:>10} blocks"
+			)
+
+	regressions = []
+	if args.baseline:
+		with open(args.baseline) as f:
+			regressions = compare(results, json.load(f), args.threshold)
+
+	report = {
+		"created": datetime.now().isoformat(timespec="seconds"),
+		"params": {k: getattr(args, k) for k in ("stations", "sources", "days", "grid", "seed", "repeat")},
+		"end": str(end),
+		"rows": {table: len(df) for table, df in dataset.items()},
+		"python": platform.python_version(),
+		"pandas": pd.__version__,
+		"results": results,
+		"memory": memory,
+		"regressions": regressions
+	}
+	os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+	with open(args.out, "w") as f:
+		json.dump(report, f, indent=2)
+	print(f"Results written to {args.out}")
+
+	if regressions:
+		print(f"Slower than baseline by more than {args.threshold:.0%}:")
+		for name in regressions:
+			print(f"  {name}: {results[name]['ratio']:.2f}x")
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
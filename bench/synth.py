@@ -0,0 +1,116 @@
+# Seeded synthetic data shaped like the tes and hourly_data tables.
+#
+#   python bench/synth.py --stations 60 --days 30 --grid 40 --out /tmp/aqi-synth
+#
+# Frames come back as read_sql would return them (object strings, float64),
+# so loaders' schema handling is part of what gets measured. The same seed
+# always produces the same data.
+
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+SOURCES = ["iqair", "rendahemisi", "klhk", "udarajakarta"]
+
+# Greater Jakarta, roughly the extent of the prediction grid
+LAT_RANGE = (-6.40, -6.05)
+LON_RANGE = (106.65, 107.05)
+
+
+def station_sites(stations, sources, rng):
+	return pd.DataFrame({
+		"station": [f"Station {i:03d}" for i in range(stations)],
+		"sourceid": [SOURCES[i % sources] for i in range(stations)],
+		"latitude": rng.uniform(*LAT_RANGE, stations),
+		"longitude": rng.uniform(*LON_RANGE, stations)
+	})
+
+
+def make_tes(stations=60, sources=4, days=7, end=None, seed=0):
+	# Hourly readings for every station over the last `days` days up to `end`
+	rng = np.random.default_rng(seed)
+	end = pd.Timestamp(end or datetime.now()).floor("h")
+	hours = pd.date_range(end - timedelta(days=days) + timedelta(hours=1), end, freq="h")
+	sites = station_sites(stations, min(sources, len(SOURCES)), rng)
+
+	n = len(sites) * len(hours)
+	site_idx = np.repeat(np.arange(len(sites)), len(hours))
+	hour_of_day = np.tile(hours.hour.to_numpy(), len(sites))
+
+	# A daily cycle plus per-station level and noise
+	level = rng.uniform(15, 60, len(sites))[site_idx]
+	pm25 = np.clip(level * (1 + 0.3 * np.sin((hour_of_day - 4) / 24 * 2 * np.pi)) + rng.normal(0, 6, n), 1, None)
+	aqi = np.clip(pm25 * 2.4 + rng.normal(0, 5, n), 1, 500).round()
+
+	df = pd.DataFrame({
+		"station": sites["station"].to_numpy()[site_idx],
+		"sourceid": sites["sourceid"].to_numpy()[site_idx],
+		"time": np.tile(hours.to_numpy(), len(sites)),
+		"aqi": aqi,
+		"PM2.5": pm25.round(1),
+		"latitude": sites["latitude"].to_numpy()[site_idx],
+		"longitude": sites["longitude"].to_numpy()[site_idx]
+	})
+
+	# Sources drop readings now and then
+	return df[rng.random(n) > 0.05].reset_index(drop=True)
+
+
+def make_hourly_data(grid=40, days=7, end=None, seed=0):
+	# A grid x grid prediction surface per day, one row per cell
+	rng = np.random.default_rng(seed + 1)
+	end = pd.Timestamp(end or datetime.now()).normalize()
+	dates = pd.date_range(end - timedelta(days=days - 1), end, freq="D")
+
+	lat, lon = np.meshgrid(np.linspace(*LAT_RANGE, grid), np.linspace(*LON_RANGE, grid), indexing="ij")
+	cells = grid * grid
+	n = cells * len(dates)
+
+	base = 35 + 15 * np.sin(np.tile(lat.ravel(), len(dates)) * 40) + rng.normal(0, 4, n)
+	return pd.DataFrame({
+		"date": np.repeat(dates.date, cells),
+		"latitude": np.tile(lat.ravel(), len(dates)),
+		"longitude": np.tile(lon.ravel(), len(dates)),
+		"mean_aod": rng.uniform(0.1, 1.2, n),
+		"pm25_xgb": base + rng.normal(0, 3, n),
+		"pm25_rf": base + rng.normal(0, 4, n),
+		"pm25_lgbm": base + rng.normal(0, 3.5, n)
+	})
+
+
+def make_dataset(stations=60, sources=4, days=7, grid=40, end=None, seed=0):
+	return {
+		"tes": make_tes(stations, sources, days, end, seed),
+		"hourly_data": make_hourly_data(grid, days, end, seed)
+	}
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Write a seeded synthetic tes / hourly_data dataset")
+	parser.add_argument("--stations", type=int, default=60)
+	parser.add_argument("--sources", type=int, default=4)
+	parser.add_argument("--days", type=int, default=7)
+	parser.add_argument("--grid", type=int, default=40, help="prediction grid is GRID x GRID cells")
+	parser.add_argument("--end", help="last day of data, YYYY-MM-DD (default: now)")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+	parser.add_argument("--out", default="bench/data")
+	args = parser.parse_args()
+
+	os.makedirs(args.out, exist_ok=True)
+	dataset = make_dataset(args.stations, args.sources, args.days, args.grid, args.end, args.seed)
+	for table, df in dataset.items():
+		path = os.path.join(args.out, f"{table}.{args.format}")
+		if args.format == "parquet":
+			df.to_parquet(path, index=False)
+		else:
+			df.to_csv(path, index=False)
+		print(f"{table}: {len(df):,} rows -> {path}")
+
+
+if __name__ == "__main__":
+	main()
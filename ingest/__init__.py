@@ -0,0 +1,7 @@
+# Ingestion of station readings from the four upstream sources into `tes`.
+#
+#   python -m ingest --once                              poll every source once
+#   python -m ingest --interval 3600                     poll every hour
+#   python -m ingest --once --fixtures ingest/fixtures --store memory
+#                                                        replay recorded payloads
+#                                                        without network or Postgres
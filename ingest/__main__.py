@@ -0,0 +1,63 @@
+import argparse
+import logging
+import time
+
+from .service import run_once
+from .sources import SOURCES, fixture_fetcher, fixture_requests, http_fetcher
+from .store import MemoryStore, PostgresStore
+
+
+logger = logging.getLogger("ingest")
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="python -m ingest", description="Poll the upstream air quality sources into tes")
+	parser.add_argument("--once", action="store_true", help="poll once and exit")
+	parser.add_argument("--interval", type=int, default=3600, help="seconds between polls")
+	parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+	parser.add_argument("--fixtures", help="replay recorded payloads from this directory instead of calling the APIs")
+	parser.add_argument("--store", choices=["postgres", "memory"], default="postgres")
+	parser.add_argument("--create-index", action="store_true", help="create the (station, time) unique index the upsert needs")
+	parser.add_argument("--source", action="append", help="only poll these sources (repeatable)")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	sources = [s for s in SOURCES if not args.source or s.name in args.source]
+	if args.fixtures:
+		fetch = fixture_fetcher(args.fixtures)
+		list_requests = lambda source: fixture_requests(source, args.fixtures)
+	else:
+		fetch = http_fetcher(args.timeout)
+		list_requests = lambda source: source.requests()
+
+	store = MemoryStore() if args.store == "memory" else PostgresStore()
+	needs_index = args.create_index
+
+	try:
+		while True:
+			# One failed poll (database down, dropped connection, missing
+			# index) is logged and retried next cycle on a fresh connection,
+			# rather than ending the service
+			try:
+				if needs_index:
+					store.create_index()
+					needs_index = False
+				run_once(sources, fetch, list_requests, store, timeout=args.timeout)
+			except Exception:
+				if args.once:
+					raise
+				logger.exception("poll failed, retrying in %d s", args.interval)
+				store.reset()
+			if args.once:
+				break
+			time.sleep(args.interval)
+	finally:
+		if isinstance(store, MemoryStore):
+			for row in sorted(store.rows.values(), key=lambda r: (r["sourceid"], r["station"], r["time"])):
+				print(row["sourceid"], row["station"], row["time"], row["aqi"], row["PM2.5"], sep="\t")
+		store.close()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,101 @@
+# Conversion of source records to the `tes` row layout:
+#   station, sourceid, time, aqi, "PM2.5", latitude, longitude
+
+from datetime import datetime, timezone, timedelta
+
+
+# Readings are stored in Jakarta wall-clock time, like the existing rows
+JAKARTA = timezone(timedelta(hours=7))
+
+COLUMNS = ["station", "sourceid", "time", "aqi", "PM2.5", "latitude", "longitude"]
+
+# US EPA PM2.5 breakpoints (µg/m³ -> AQI), the same scale as the dashboard legend
+PM25_BREAKPOINTS = [
+	(0.0, 12.0, 0, 50),
+	(12.1, 35.4, 51, 100),
+	(35.5, 55.4, 101, 150),
+	(55.5, 150.4, 151, 200),
+	(150.5, 250.4, 201, 300),
+	(250.5, 350.4, 301, 400),
+	(350.5, 500.4, 401, 500)
+]
+
+
+def pm25_to_aqi(pm25):
+	if pm25 is None or pm25 < 0:
+		return None
+	pm25 = round(pm25, 1)
+	for c_lo, c_hi, i_lo, i_hi in PM25_BREAKPOINTS:
+		if pm25 <= c_hi:
+			return round((i_hi - i_lo) / (c_hi - c_lo) * (max(pm25, c_lo) - c_lo) + i_lo)
+	return 500
+
+
+def aqi_to_pm25(aqi):
+	if aqi is None or aqi < 0:
+		return None
+	for c_lo, c_hi, i_lo, i_hi in PM25_BREAKPOINTS:
+		if aqi <= i_hi:
+			return round((c_hi - c_lo) / (i_hi - i_lo) * (max(aqi, i_lo) - i_lo) + c_lo, 1)
+	return 500.4
+
+
+def to_float(value):
+	try:
+		value = float(value)
+	except (TypeError, ValueError):
+		return None
+	return value if value == value else None
+
+
+def parse_time(value):
+	# ISO strings (with or without offset) or epoch seconds, returned as naive
+	# Jakarta time floored to the hour so sources reporting the same hour at
+	# different minutes collapse onto one row
+	if isinstance(value, (int, float)):
+		moment = datetime.fromtimestamp(value, tz=timezone.utc)
+	else:
+		moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+	if moment.tzinfo is not None:
+		moment = moment.astimezone(JAKARTA).replace(tzinfo=None)
+	return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def make_row(station, sourceid, time, latitude, longitude, aqi=None, pm25=None):
+	aqi, pm25 = to_float(aqi), to_float(pm25)
+	if aqi is None and pm25 is None:
+		return None
+	if aqi is None:
+		aqi = pm25_to_aqi(pm25)
+	if pm25 is None:
+		pm25 = aqi_to_pm25(aqi)
+
+	latitude, longitude = to_float(latitude), to_float(longitude)
+	if latitude is None or longitude is None or not station:
+		return None
+
+	# A missing or malformed timestamp drops this reading only, not the rest
+	# of the payload it came in
+	try:
+		time = parse_time(time)
+	except (TypeError, ValueError, OverflowError, OSError):
+		return None
+
+	return {
+		"station": str(station).strip(),
+		"sourceid": sourceid,
+		"time": time,
+		"aqi": aqi,
+		"PM2.5": pm25,
+		"latitude": latitude,
+		"longitude": longitude
+	}
+
+
+def deduplicate(rows):
+	# One row per (station, time); later rows win. ON CONFLICT cannot touch the
+	# same row twice in one statement, so this has to happen before the upsert.
+	unique = {}
+	for row in rows:
+		unique[(row["station"], row["time"])] = row
+	return list(unique.values())
@@ -0,0 +1,173 @@
+# Publishes a weekly prediction file into hourly_data.
+#
+#   python -m ingest.predictions predictions.parquet
+#   python -m ingest.predictions predictions.csv --chunk-rows 100000 --dry-run
+#
+# The file is COPYed into a temporary staging table in chunks, then every date
+# it contains is replaced in hourly_data in a single transaction, so running
+# the same file twice leaves the table unchanged. Readers keep seeing the old
+# rows until the commit (MVCC), and the per-date coverage used to pick
+# displayable dates is refreshed in the same transaction.
+
+import argparse
+import io
+import logging
+import os
+import time
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ["date", "latitude", "longitude"]
+MODEL_COLUMNS = ["pm25_xgb", "pm25_rf", "pm25_lgbm"]
+
+COVERAGE_TABLE = """
+	CREATE TABLE IF NOT EXISTS hourly_data_coverage (
+		date DATE PRIMARY KEY,
+		n_rows INTEGER NOT NULL,
+		n_valid INTEGER NOT NULL,
+		updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+	)
+"""
+
+
+def coverage_insert(source, target_columns):
+	# Upsert the row count, valid-cell count and upload time of each date in `source`
+	valid = " AND ".join(f"{c} IS NOT NULL" for c in MODEL_COLUMNS if c in target_columns)
+	return f"""
+		INSERT INTO hourly_data_coverage (date, n_rows, n_valid, updated_at)
+		SELECT
+			date,
+			COUNT(*),
+			COUNT(*) FILTER (WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND {valid}),
+			now()
+		FROM {source}
+		GROUP BY date
+		ON CONFLICT (date) DO UPDATE SET
+			n_rows = EXCLUDED.n_rows,
+			n_valid = EXCLUDED.n_valid,
+			updated_at = EXCLUDED.updated_at
+	"""
+
+
+def read_chunks(path, chunk_rows):
+	if path.lower().endswith(".parquet"):
+		import pyarrow.parquet as pq
+
+		for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+			yield batch.to_pandas()
+	else:
+		yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def table_columns(cur, table):
+	cur.execute(
+		"SELECT column_name FROM information_schema.columns WHERE table_name = %s ORDER BY ordinal_position",
+		(table,)
+	)
+	return [r[0] for r in cur.fetchall()]
+
+
+def copy_chunk(cur, chunk, columns):
+	buffer = io.StringIO()
+	chunk[columns].to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d")
+	buffer.seek(0)
+	column_list = ", ".join(f'"{c}"' for c in columns)
+	cur.copy_expert(f"COPY hourly_data_staging ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def upload(conn, path, chunk_rows=200000, dry_run=False):
+	start = time.perf_counter()
+	with conn.cursor() as cur:
+		target_columns = table_columns(cur, "hourly_data")
+		if not target_columns:
+			raise SystemExit("hourly_data does not exist")
+
+		if not table_columns(cur, "hourly_data_coverage"):
+			cur.execute(COVERAGE_TABLE)
+			# Dates published before the table existed would otherwise vanish
+			# from the dashboard, which only offers dates listed here
+			cur.execute(coverage_insert("hourly_data", target_columns))
+		cur.execute("CREATE TEMP TABLE hourly_data_staging (LIKE hourly_data INCLUDING DEFAULTS) ON COMMIT DROP")
+
+		columns = None
+		staged = 0
+		for chunk in read_chunks(path, chunk_rows):
+			if columns is None:
+				missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+				if missing:
+					raise SystemExit(f"{path} is missing required columns: {', '.join(missing)}")
+				columns = [c for c in target_columns if c in chunk.columns]
+				ignored = [c for c in chunk.columns if c not in target_columns]
+				if ignored:
+					logger.warning("ignoring columns not in hourly_data: %s", ", ".join(ignored))
+
+			chunk["date"] = pd.to_datetime(chunk["date"]).dt.date
+			copy_chunk(cur, chunk, columns)
+			staged += len(chunk)
+			logger.info("staged %d rows", staged)
+
+		if not staged:
+			raise SystemExit(f"{path} has no rows")
+
+		cur.execute("SELECT DISTINCT date FROM hourly_data_staging ORDER BY date")
+		dates = [r[0] for r in cur.fetchall()]
+
+		# Replace each staged date wholesale so re-running a file is a no-op
+		cur.execute("""
+			DELETE FROM hourly_data h
+			USING (SELECT DISTINCT date FROM hourly_data_staging) s
+			WHERE h.date = s.date
+		""")
+		replaced = cur.rowcount
+
+		column_list = ", ".join(f'"{c}"' for c in columns)
+		cur.execute(f"INSERT INTO hourly_data ({column_list}) SELECT {column_list} FROM hourly_data_staging")
+		inserted = cur.rowcount
+
+		# The dashboard offers the dates with >= 75 valid cells here and keys
+		# its cached grids on MAX(updated_at), so both follow this upload
+		cur.execute(coverage_insert("hourly_data_staging", target_columns))
+
+	if dry_run:
+		conn.rollback()
+	else:
+		conn.commit()
+
+	elapsed = time.perf_counter() - start
+	logger.info(
+		"%s %d dates (%s to %s): %d rows replaced, %d inserted in %.1f s",
+		"would publish" if dry_run else "published",
+		len(dates), dates[0], dates[-1], replaced, inserted, elapsed
+	)
+	return dates, replaced, inserted
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="python -m ingest.predictions", description="Upload model predictions into hourly_data")
+	parser.add_argument("path", help="CSV or Parquet file with date, latitude, longitude and model columns")
+	parser.add_argument("--chunk-rows", type=int, default=200000, help="rows per COPY chunk")
+	parser.add_argument("--dry-run", action="store_true", help="stage and merge, then roll back")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	import psycopg2
+
+	conn = psycopg2.connect(
+		host=os.environ.get("DB_HOST"),
+		port=os.environ.get("DB_PORT"),
+		dbname=os.environ.get("DB_NAME"),
+		user=os.environ.get("DB_USER"),
+		password=os.environ.get("DB_PASS")
+	)
+	try:
+		upload(conn, args.path, chunk_rows=args.chunk_rows, dry_run=args.dry_run)
+	finally:
+		conn.close()
+
+
+if __name__ == "__main__":
+	main()
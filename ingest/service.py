@@ -0,0 +1,60 @@
+# Polls every source concurrently, writes the combined rows in one batched
+# upsert and reports how long each source took.
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+from .normalize import deduplicate
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SourceResult:
+	source: str
+	rows: list = field(default_factory=list)
+	latency: float = 0.0
+	requests: int = 0
+	error: str = None
+
+
+async def poll_source(source, fetch, requests, timeout):
+	start = time.perf_counter()
+	result = SourceResult(source.name, requests=len(requests))
+
+	async def fetch_one(name, url):
+		payload = await asyncio.wait_for(asyncio.to_thread(fetch, name, url), timeout)
+		return source.parse(payload)
+
+	outcomes = await asyncio.gather(*(fetch_one(n, u) for n, u in requests), return_exceptions=True)
+	for outcome in outcomes:
+		if isinstance(outcome, BaseException):
+			result.error = f"{type(outcome).__name__}: {outcome}"
+			logger.warning("%s: %s", source.name, result.error)
+		else:
+			result.rows.extend(outcome)
+
+	result.latency = time.perf_counter() - start
+	return result
+
+
+async def poll_all(sources, fetch, list_requests, timeout=30):
+	return await asyncio.gather(*(poll_source(s, fetch, list_requests(s), timeout) for s in sources))
+
+
+def run_once(sources, fetch, list_requests, store, timeout=30):
+	results = asyncio.run(poll_all(sources, fetch, list_requests, timeout))
+
+	rows = deduplicate([row for r in results for row in r.rows])
+	written = store.upsert(rows) if rows else 0
+
+	for r in results:
+		status = "ok" if r.error is None else r.error
+		if r.requests == 0:
+			status = "skipped (no URL configured)"
+		logger.info("%-13s %3d requests  %5d rows  %7.0f ms  %s", r.source, r.requests, len(r.rows), r.latency * 1000, status)
+	logger.info("wrote %d rows", written)
+	return results, written
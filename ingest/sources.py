@@ -0,0 +1,128 @@
+# Adapters for the four upstream sources. Each adapter lists the requests it
+# needs and turns the JSON payloads into `tes` rows; fetching is left to the
+# caller, so the same adapter runs against live URLs or recorded fixtures.
+#
+# URLs (and any API keys in them) come from the environment. A source with no
+# URL configured is skipped.
+
+import json
+import os
+import urllib.request
+
+from .normalize import make_row
+
+
+class Source:
+	name = None
+	sourceid = None
+	env = None
+
+	def requests(self):
+		# [(fixture name, url)]
+		urls = [u.strip() for u in os.environ.get(self.env, "").split(",") if u.strip()]
+		if len(urls) == 1:
+			return [(self.name, urls[0])]
+		return [(f"{self.name}_{i}", url) for i, url in enumerate(urls)]
+
+	def parse(self, payload):
+		raise NotImplementedError
+
+
+class IQAir(Source):
+	# AirVisual v2 station endpoint, one URL per station:
+	#   {"status": "success", "data": {"name": ..., "location": {"coordinates": [lon, lat]},
+	#    "current": {"pollution": {"ts": ..., "aqius": ...}}}}
+	name = "iqair"
+	sourceid = "iqair"
+	env = "IQAIR_URLS"
+
+	def parse(self, payload):
+		if payload.get("status") != "success":
+			return []
+		data = payload["data"]
+		lon, lat = data["location"]["coordinates"]
+		pollution = data["current"]["pollution"]
+		row = make_row(data["name"], self.sourceid, pollution["ts"], lat, lon, aqi=pollution.get("aqius"))
+		return [row] if row else []
+
+
+class RendahEmisi(Source):
+	# Jakarta Rendah Emisi ISPU feed:
+	#   {"data": [{"nama": ..., "lat": ..., "lng": ..., "waktu": ..., "pm25": ...}]}
+	# The feed's index is ISPU, so AQI is derived from the PM2.5 concentration.
+	name = "rendahemisi"
+	sourceid = "rendahemisi"
+	env = "RENDAHEMISI_URL"
+
+	def parse(self, payload):
+		rows = []
+		for item in payload.get("data", []):
+			row = make_row(item.get("nama"), self.sourceid, item.get("waktu"), item.get("lat"), item.get("lng"), pm25=item.get("pm25"))
+			if row:
+				rows.append(row)
+		return rows
+
+
+class KLHK(Source):
+	# KLHK stations through the WAQI map-bounds API over Jakarta:
+	#   {"status": "ok", "data": [{"lat": ..., "lon": ..., "aqi": "57",
+	#    "station": {"name": ..., "time": ...}}]}
+	name = "klhk"
+	sourceid = "klhk"
+	env = "KLHK_URL"
+
+	def parse(self, payload):
+		if payload.get("status") != "ok":
+			return []
+		rows = []
+		for item in payload.get("data", []):
+			station = item.get("station", {})
+			row = make_row(station.get("name"), self.sourceid, station.get("time"), item.get("lat"), item.get("lon"), aqi=item.get("aqi"))
+			if row:
+				rows.append(row)
+		return rows
+
+
+class UdaraJakarta(Source):
+	# Udara Jakarta station list:
+	#   [{"name": ..., "latitude": ..., "longitude": ..., "timestamp": ..., "pm25": ..., "aqi": ...}]
+	name = "udarajakarta"
+	sourceid = "udarajakarta"
+	env = "UDARAJAKARTA_URL"
+
+	def parse(self, payload):
+		rows = []
+		for item in payload:
+			row = make_row(item.get("name"), self.sourceid, item.get("timestamp"), item.get("latitude"), item.get("longitude"), aqi=item.get("aqi"), pm25=item.get("pm25"))
+			if row:
+				rows.append(row)
+		return rows
+
+
+SOURCES = [IQAir(), RendahEmisi(), KLHK(), UdaraJakarta()]
+
+
+def http_fetcher(timeout=30):
+	def fetch(name, url):
+		request = urllib.request.Request(url, headers={"User-Agent": "AQIDashboard-ingest/1.0"})
+		with urllib.request.urlopen(request, timeout=timeout) as response:
+			return json.load(response)
+	return fetch
+
+
+def fixture_fetcher(directory):
+	# Replays payloads recorded as <fixture name>.json
+	def fetch(name, url):
+		with open(os.path.join(directory, f"{name}.json")) as f:
+			return json.load(f)
+	return fetch
+
+
+def fixture_requests(source, directory):
+	# In fixture mode every recorded file for the source is replayed,
+	# whether or not a URL is configured
+	names = sorted(
+		f[:-5] for f in os.listdir(directory)
+		if f.endswith(".json") and (f[:-5] == source.name or f.startswith(source.name + "_"))
+	)
+	return [(name, None) for name in names]
@@ -0,0 +1,89 @@
+# Destinations for normalised rows. PostgresStore writes to `tes` with batched
+# upserts; MemoryStore is a stand-in with the same behaviour for local runs.
+
+import os
+
+from .normalize import COLUMNS, deduplicate
+
+
+UPSERT = """
+	INSERT INTO tes (station, sourceid, time, aqi, "PM2.5", latitude, longitude)
+	VALUES %s
+	ON CONFLICT (station, time) DO UPDATE SET
+		sourceid = EXCLUDED.sourceid,
+		aqi = EXCLUDED.aqi,
+		"PM2.5" = EXCLUDED."PM2.5",
+		latitude = EXCLUDED.latitude,
+		longitude = EXCLUDED.longitude
+"""
+
+
+class PostgresStore:
+	# Connects lazily, so after reset() the next write opens a new connection
+	# instead of reusing one the server or network dropped
+
+	def __init__(self, batch_size=500):
+		self.batch_size = batch_size
+		self.conn = None
+
+	def connection(self):
+		import psycopg2
+
+		if self.conn is None or self.conn.closed:
+			self.conn = psycopg2.connect(
+				host=os.environ.get("DB_HOST"),
+				port=os.environ.get("DB_PORT"),
+				dbname=os.environ.get("DB_NAME"),
+				user=os.environ.get("DB_USER"),
+				password=os.environ.get("DB_PASS")
+			)
+		return self.conn
+
+	def create_index(self):
+		# ON CONFLICT needs a unique index on (station, time). Fails if the
+		# table already holds duplicates; remove those first.
+		conn = self.connection()
+		with conn, conn.cursor() as cur:
+			cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS tes_station_time_key ON tes (station, time)")
+
+	def upsert(self, rows):
+		from psycopg2.extras import execute_values
+
+		rows = deduplicate(rows)
+		values = [tuple(row[c] for c in COLUMNS) for row in rows]
+		conn = self.connection()
+		with conn, conn.cursor() as cur:
+			execute_values(cur, UPSERT, values, page_size=self.batch_size)
+		return len(values)
+
+	def reset(self):
+		# Drop the connection after a failure; the next call reconnects
+		if self.conn is not None:
+			try:
+				self.conn.close()
+			except Exception:
+				pass
+			self.conn = None
+
+	def close(self):
+		self.reset()
+
+
+class MemoryStore:
+	def __init__(self):
+		self.rows = {}
+
+	def create_index(self):
+		pass
+
+	def upsert(self, rows):
+		rows = deduplicate(rows)
+		for row in rows:
+			self.rows[(row["station"], row["time"])] = row
+		return len(rows)
+
+	def reset(self):
+		pass
+
+	def close(self):
+		pass
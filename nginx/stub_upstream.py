@@ -0,0 +1,50 @@
+# Stand-in for the api and streamlit containers used by test_cache.sh. It
+# answers like the real services (JSON with ETag/Cache-Control, a static asset,
+# a CSV download) and counts how many requests actually reach it.
+
+import hashlib
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+hits = {}
+
+
+class Handler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		path = self.path.split("?")[0]
+		hits[path] = hits.get(path, 0) + 1
+
+		if path == "/__hits":
+			return self.reply(200, json.dumps(hits).encode(), "application/json", "no-store")
+
+		if path.startswith("/api/"):
+			body = json.dumps([{"station": f"Station {i}", "PM2.5": 20.0 + i} for i in range(200)]).encode()
+			etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+			if self.headers.get("If-None-Match") == etag:
+				return self.reply(304, b"", None, "public, max-age=60", etag)
+			return self.reply(200, body, "application/json", "public, max-age=60", etag)
+
+		if path.startswith("/static/"):
+			return self.reply(200, b"console.log('bundle');" * 200, "application/javascript", "no-cache")
+
+		if path.startswith("/media/"):
+			return self.reply(200, b"station,time,PM2.5\n" + b"A,2025-01-01 10:00,20.0\n" * 500, "text/csv", "no-cache")
+
+		return self.reply(200, b"<html><body>" + b"<p>dashboard</p>" * 200 + b"</body></html>", "text/html", "no-cache")
+
+	def reply(self, status, body, content_type, cache_control, etag=None):
+		self.send_response(status)
+		if content_type:
+			self.send_header("Content-Type", content_type)
+		self.send_header("Content-Length", str(len(body)))
+		self.send_header("Cache-Control", cache_control)
+		if etag:
+			self.send_header("ETag", etag)
+		self.end_headers()
+		self.wfile.write(body)
+
+
+if __name__ == "__main__":
+	ThreadingHTTPServer(("0.0.0.0", int(os.environ.get("PORT", 8000))), Handler).serve_forever()
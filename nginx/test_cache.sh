@@ -0,0 +1,52 @@
+#!/usr/bin/env bash
+# Local harness for nginx.prod.conf: starts nginx in front of stub upstreams,
+# requests each route twice and prints the cache status, compression and how
+# many requests reached the upstream.
+#
+#   ./nginx/test_cache.sh          # start, check, tear down
+#   KEEP=1 ./nginx/test_cache.sh   # leave the stack running afterwards
+
+set -euo pipefail
+cd "$(dirname "$0")"
+
+COMPOSE="docker compose -f docker-compose.cache-test.yml -p aqi-cache-test"
+BASE="http://localhost:8080"
+
+cleanup() {
+	if [ -z "${KEEP:-}" ]; then
+		$COMPOSE down -v >/dev/null 2>&1 || true
+	fi
+}
+trap cleanup EXIT
+
+$COMPOSE up -d >/dev/null
+for _ in $(seq 1 30); do
+	curl -fs "$BASE/" >/dev/null 2>&1 && break
+	sleep 1
+done
+
+check() {
+	local path="$1"
+	for attempt in 1 2; do
+		local headers
+		headers=$(curl -s -o /dev/null -D - -H "Accept-Encoding: gzip" "$BASE$path")
+		printf "%-28s try %s  status=%-4s cache=%-8s encoding=%-5s cache-control=%s\n" \
+			"$path" "$attempt" \
+			"$(echo "$headers" | awk 'NR==1 {print $2}')" \
+			"$(echo "$headers" | awk -F': ' 'tolower($1)=="x-cache-status" {print $2}' | tr -d '\r')" \
+			"$(echo "$headers" | awk -F': ' 'tolower($1)=="content-encoding" {print $2}' | tr -d '\r')" \
+			"$(echo "$headers" | awk -F': ' 'tolower($1)=="cache-control" {print $2}' | tr -d '\r' | paste -sd ',' -)"
+	done
+}
+
+check /api/stations/latest
+check "/api/grid?date=2025-01-01"
+check /static/js/main.abc123.js
+check /media/air_quality_filtered.csv
+check /
+
+echo
+echo "Requests that reached the api stub:"
+$COMPOSE exec -T api python -c "import urllib.request; print(urllib.request.urlopen('http://localhost:8000/__hits').read().decode())"
+echo "Requests that reached the streamlit stub:"
+$COMPOSE exec -T streamlit python -c "import urllib.request; print(urllib.request.urlopen('http://localhost:8501/__hits').read().decode())"